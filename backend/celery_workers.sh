@@ -0,0 +1,37 @@
+#!/bin/bash
+# Sample worker layout: one Celery worker per queue, each with a pool suited
+# to its workload. Tune the concurrency to the host.
+#
+#   ./celery_workers.sh start|stop|restart
+#
+#   ocr           I/O bound (waits on the OCR service)      threads
+#   evaluation    plagiarism checks and RAG scoring chords   prefork
+#   rag-training  I/O bound, long requests                   threads
+#   maintenance   cache eviction, cleanup, unrouted tasks    prefork, 1 process
+
+ACTION=${1:-start}
+
+OCR_CONCURRENCY=${OCR_CONCURRENCY:-16}
+EVALUATION_CONCURRENCY=${EVALUATION_CONCURRENCY:-4}
+TRAINING_CONCURRENCY=${TRAINING_CONCURRENCY:-4}
+
+mkdir -p /var/run/celery /var/log/celery
+
+celery multi "$ACTION" ocr evaluation training maintenance \
+    -A config \
+    -l info \
+    --pidfile=/var/run/celery/%n.pid \
+    --logfile=/var/log/celery/%n%I.log \
+    -Q:ocr ocr -P:ocr threads -c:ocr "$OCR_CONCURRENCY" \
+    -Q:evaluation evaluation -P:evaluation prefork -c:evaluation "$EVALUATION_CONCURRENCY" \
+    -Q:training rag-training -P:training threads -c:training "$TRAINING_CONCURRENCY" \
+    -Q:maintenance maintenance,default -P:maintenance prefork -c:maintenance 1
+
+# Periodic tasks (OCR cache eviction, deadline evaluations)
+if [ "$ACTION" = "start" ]; then
+    celery -A config beat -l info --detach \
+        --pidfile=/var/run/celery/beat.pid \
+        --logfile=/var/log/celery/beat.log
+elif [ "$ACTION" = "stop" ] && [ -f /var/run/celery/beat.pid ]; then
+    kill "$(cat /var/run/celery/beat.pid)"
+fi
@@ -6,4 +6,11 @@ admin.site.register(Classroom)
 admin.site.register(StudentClassroom)
 admin.site.register(JoinRequest)
 admin.site.register(Assignment)
-admin.site.register(StudentAssignment)
\ No newline at end of file
+admin.site.register(StudentAssignment)
+admin.site.register(PlagiarismFingerprint)
+admin.site.register(OcrCacheEntry)
+admin.site.register(SubmissionPage)
+admin.site.register(RagCollection)
+admin.site.register(UnknownRagCollection)
+admin.site.register(QuestionCacheEntry)
+admin.site.register(RagScoreCacheEntry)
\ No newline at end of file
@@ -0,0 +1,202 @@
+import datetime
+import io
+import random
+import textwrap
+import uuid
+
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from users.models import User
+from teacher.models import Teacher
+from student.models import Student
+from classroom.models import Classroom, Assignment, StudentAssignment, SubmissionPage, compress_text
+
+COHORT_SIZES = [10, 100, 1000, 10000]
+
+_VOCABULARY = [
+    "algorithm", "array", "binary", "cache", "compile", "data", "debug",
+    "graph", "hash", "heap", "index", "kernel", "latency", "memory", "node",
+    "pointer", "queue", "recursion", "schema", "stack", "thread", "tree",
+    "vector", "query", "network", "packet", "process", "signal", "buffer",
+]
+
+
+def synthetic_texts(size, words=400, pages=4, copy_rate=0.05, seed=0):
+    """
+    `size` answer texts of roughly `words` words split into `pages` pages
+    (joined by form feeds). About `copy_rate` of them are verbatim copies
+    of an earlier text, so plagiarism checks have something to find.
+    """
+    rng = random.Random(seed)
+    words_per_page = max(1, words // pages)
+    texts = []
+
+    for i in range(size):
+        if texts and rng.random() < copy_rate:
+            texts.append(rng.choice(texts))
+            continue
+
+        texts.append("\f".join(
+            " ".join(
+                f"{rng.choice(_VOCABULARY)}{rng.randint(0, 999)}"
+                for _ in range(words_per_page)
+            )
+            for _ in range(pages)
+        ))
+
+    return texts
+
+
+# Bitmap font: rendering scanned pages with it is far cheaper than FreeType
+_SCAN_FONT = ImageFont.load_default_imagefont()
+
+
+def synthetic_pdf(text, scanned_pages=()):
+    """
+    A4 PDF with one page per form feed of `text`. Pages whose 0-based index
+    is in `scanned_pages` are a rendered image with no text layer, like a
+    scan; the rest carry their text as a text layer. Scanned pages keep
+    their text in a note annotation, which the OCR stub reads in place of
+    doing OCR.
+    """
+    width, height = A4
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+
+    for index, page_text in enumerate(text.split("\f")):
+        lines = textwrap.wrap(page_text, 90) or [""]
+
+        if index in scanned_pages:
+            # 1 pixel per point, about 72 dpi
+            image = Image.new("L", (int(width), int(height)), 255)
+            ImageDraw.Draw(image).multiline_text(
+                (40, 40), "\n".join(lines), fill=0, font=_SCAN_FONT, spacing=4
+            )
+            pdf.drawImage(ImageReader(image), 0, 0, width, height)
+            pdf.textAnnotation(page_text, Rect=(0, 0, 1, 1))
+        else:
+            body = pdf.beginText(40, height - 50)
+            body.setFont("Helvetica", 9)
+            for line in lines:
+                body.textLine(line)
+            pdf.drawText(body)
+
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+def create_synthetic_cohort(size, extracted_text="synthetic answer", texts=None,
+                            ocr_done=True, scanned_rate=0.25, seed=0):
+    """
+    Create a teacher, classroom, assignment and `size` submitted
+    StudentAssignment rows using bulk inserts.
+
+    With `texts`, each submission gets its own text; with ocr_done=False the
+    texts are written as the submitted files instead, as real PDFs in which
+    about `scanned_rate` of the pages are scanned images needing OCR, and
+    OCR is left pending. Returns (assignment, submissions).
+    """
+    tag = uuid.uuid4().hex[:8]
+    rng = random.Random(seed)
+
+    teacher_user = User.objects.create(
+        username=f"bench_t_{tag}",
+        email=f"bench_t_{tag}@bench.local",
+        role=User.Role.TEACHER
+    )
+    teacher = Teacher.objects.create(
+        user=teacher_user,
+        first_name="Bench",
+        last_name="Teacher",
+        email=teacher_user.email,
+        gender="MALE",
+        university="Bench University",
+        phone_no=f"t{tag}"
+    )
+    classroom = Classroom.objects.create(teacher=teacher, name=f"Bench {tag}")
+    assignment = Assignment.objects.create(
+        classroom=classroom,
+        teacher=teacher,
+        title=f"Bench {tag}",
+        deadline=timezone.now() + datetime.timedelta(days=1),
+        rag_collection=f"bench_{tag}",
+        rag_trained=True,
+        status="ACTIVE"
+    )
+
+    users = User.objects.bulk_create([
+        User(
+            username=f"bench_s_{tag}_{i}",
+            email=f"bench_s_{tag}_{i}@bench.local",
+            role=User.Role.STUDENT
+        )
+        for i in range(size)
+    ])
+    students = Student.objects.bulk_create([
+        Student(
+            user=user,
+            first_name="Bench",
+            last_name=str(i),
+            enroll_no=str(i),
+            email=user.email,
+            phone_no=f"{tag}{i}",
+            gender="MALE",
+            date_of_birth=datetime.date(2000, 1, 1),
+            course="Bench",
+            year="1",
+            semester="1",
+            university="Bench University"
+        )
+        for i, user in enumerate(users)
+    ])
+
+    if texts is None:
+        texts = [extracted_text] * size
+
+    now = timezone.now()
+    rows = []
+    for student, text in zip(students, texts):
+        submission = StudentAssignment(
+            assignment=assignment,
+            student=student,
+            status="submitted",
+            submitted_at=now
+        )
+        if ocr_done:
+            submission.ocr_status = "success"
+        else:
+            scanned_pages = {
+                index
+                for index in range(text.count("\f") + 1)
+                if rng.random() < scanned_rate
+            }
+            submission.submitted_file.name = default_storage.save(
+                f"bench/{tag}/{student.id}.pdf",
+                ContentFile(synthetic_pdf(text, scanned_pages))
+            )
+            submission.ocr_status = "pending"
+        rows.append(submission)
+
+    submissions = StudentAssignment.objects.bulk_create(rows, batch_size=1000)
+
+    if ocr_done:
+        pages = []
+        for submission, text in zip(submissions, texts):
+            for number, page_text in enumerate(text.split("\f"), start=1):
+                pages.append(SubmissionPage(
+                    submission=submission,
+                    page_number=number,
+                    data=compress_text(page_text),
+                    source="text_layer"
+                ))
+        SubmissionPage.objects.bulk_create(pages, batch_size=1000)
+
+    return assignment, submissions
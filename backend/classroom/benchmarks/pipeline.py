@@ -0,0 +1,319 @@
+"""
+End-to-end benchmark of the submission pipeline (OCR, deadline evaluation
+and question generation) against the local service stubs.
+"""
+import resource
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from celery import current_app
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from classroom import tasks
+from classroom.benchmarks.cohorts import create_synthetic_cohort, synthetic_texts
+from classroom.benchmarks.stubs import ocr_stub, rag_stub, plagiarism_stub
+from classroom.utils import http_client, ocr_client, plag_client, rag_client
+
+
+class _Rollback(Exception):
+    pass
+
+
+def latency_summary(samples):
+    """
+    count / total / p50 / p99 / max of a list of durations in seconds.
+    """
+    if not samples:
+        return {"count": 0}
+
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "total_s": round(sum(ordered), 4),
+        "p50_s": round(percentile(50), 4),
+        "p99_s": round(percentile(99), 4),
+        "max_s": round(ordered[-1], 4),
+    }
+
+
+def peak_rss_mb():
+    # Peak over the whole process so far; ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def _patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+@contextmanager
+def point_clients_at(ocr_url, rag_url, plag_url):
+    """
+    Redirect the microservice clients to the given base URLs.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(_patched(ocr_client, "OCR_URL", f"{ocr_url}/pdf"))
+        stack.enter_context(_patched(rag_client, "RAG_PATH", rag_url))
+        stack.enter_context(_patched(rag_client, "TRAIN_URL", f"{rag_url}/train"))
+        stack.enter_context(_patched(rag_client, "SCORE_URL", f"{rag_url}/score"))
+        stack.enter_context(_patched(rag_client, "SCORE_BATCH_URL", f"{rag_url}/score/batch"))
+        stack.enter_context(_patched(plag_client, "CHECK_URL", f"{plag_url}/plagiarism/check"))
+        yield
+
+
+@contextmanager
+def in_process_lease():
+    """
+    Replace the Redis evaluation lease with a dict so the benchmark runs
+    without a Redis server.
+    """
+    held = {}
+
+    def acquire(assignment_id, ttl=None):
+        if assignment_id in held:
+            return None
+        held[assignment_id] = "bench"
+        return "bench"
+
+    def renew(assignment_id, token, ttl=None):
+        return held.get(assignment_id) == token
+
+    def release(assignment_id, token):
+        return held.pop(assignment_id, None) is not None
+
+    with ExitStack() as stack:
+        stack.enter_context(_patched(tasks, "acquire_evaluation_lease", acquire))
+        stack.enter_context(_patched(tasks, "renew_evaluation_lease", renew))
+        stack.enter_context(_patched(tasks, "release_evaluation_lease", release))
+        yield
+
+
+@contextmanager
+def eager_celery():
+    conf = current_app.conf
+    previous = conf.task_always_eager
+    conf.task_always_eager = True
+    try:
+        yield
+    finally:
+        conf.task_always_eager = previous
+
+
+class StageTimer:
+    """
+    Time every call to selected functions looked up by the tasks module.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.samples = {stage: [] for stage in stages.values()}
+
+    @contextmanager
+    def install(self):
+        with ExitStack() as stack:
+            for name, stage in self.stages.items():
+                stack.enter_context(
+                    _patched(tasks, name, self._wrap(getattr(tasks, name), stage))
+                )
+            yield self
+
+    def _wrap(self, func, stage):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+        return timed
+
+    def summary(self):
+        return {stage: latency_summary(samples) for stage, samples in self.samples.items()}
+
+
+def _bench_ocr(submissions):
+    latencies = []
+    failed = 0
+
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        for submission in submissions:
+            call_started = time.perf_counter()
+            result = tasks.run_ocr_for_submission.apply(args=[str(submission.id)])
+            latencies.append(time.perf_counter() - call_started)
+            if result.failed():
+                failed += 1
+        elapsed = time.perf_counter() - started
+
+    return {
+        "submissions": len(submissions),
+        "failed": failed,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(submissions) / elapsed, 2) if elapsed else None,
+        "latency": latency_summary(latencies),
+        "queries": len(queries),
+    }
+
+
+def _bench_evaluation(assignment):
+    timer = StageTimer({
+        "run_plagiarism": "plagiarism",
+        "run_rag_grading": "rag",
+        "finalize_marks": "finalize",
+    })
+
+    with timer.install(), CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        result = tasks.evaluate_assignment_after_deadline.apply(args=[str(assignment.id)])
+        elapsed = time.perf_counter() - started
+
+    graded = assignment.submissions.filter(status="graded").count()
+
+    return {
+        "status": "failed" if result.failed() else "ok",
+        "graded": graded,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(graded / elapsed, 2) if elapsed else None,
+        "stages": timer.summary(),
+        "queries": len(queries),
+    }
+
+
+def bench_question_generation(teacher_user, iterations):
+    """
+    Drive GenerateAssignmentQuestionsView through the request factory.
+    """
+    from classroom.views import GenerateAssignmentQuestionsView
+
+    view = GenerateAssignmentQuestionsView.as_view()
+    factory = APIRequestFactory()
+    latencies = []
+    failed = 0
+
+    with CaptureQueriesContext(connection) as queries:
+        for i in range(iterations):
+            request = factory.post(
+                "/api/classroom/assignments/generate-questions/",
+                {
+                    "resource_pdf": SimpleUploadedFile(
+                        "resource.pdf", b"synthetic resource", content_type="application/pdf"
+                    ),
+                    "num_questions": 5,
+                    "difficulty": "moderate",
+                },
+                format="multipart"
+            )
+            force_authenticate(request, user=teacher_user)
+
+            started = time.perf_counter()
+            response = view(request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                failed += 1
+
+    return {
+        "requests": iterations,
+        "failed": failed,
+        "latency": latency_summary(latencies),
+        "queries": len(queries),
+    }
+
+
+def run_pipeline_benchmark(sizes, stages, stub_options, question_iterations=10, seed=0):
+    """
+    Run the selected stages for each cohort size and return the JSON report.
+    Every cohort is created inside a transaction that is rolled back and
+    files go to a temporary MEDIA_ROOT, so the database is left untouched.
+
+    A run's peak_rss_mb is the peak of this process so far, so it covers
+    that cohort alone only if it is the first one run here (see the
+    bench_pipeline command, which runs each size in its own process).
+    """
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "stages": list(stages),
+        "stub_options": stub_options,
+        "runs": [],
+    }
+    media_root = tempfile.mkdtemp(prefix="bench_media_")
+
+    try:
+        with ExitStack() as stack:
+            stubs = {
+                "ocr": stack.enter_context(ocr_stub(**stub_options)),
+                "rag": stack.enter_context(rag_stub(**stub_options)),
+                "plagiarism": stack.enter_context(plagiarism_stub(**stub_options)),
+            }
+            stack.enter_context(point_clients_at(
+                stubs["ocr"].url, stubs["rag"].url, stubs["plagiarism"].url
+            ))
+            stack.enter_context(in_process_lease())
+            stack.enter_context(eager_celery())
+            stack.enter_context(override_settings(MEDIA_ROOT=media_root))
+
+            for size in sizes:
+                before = {name: (stub.requests, stub.failures) for name, stub in stubs.items()}
+                http_client.reset_latency_stats()
+
+                run = _run_cohort(size, stages, question_iterations, seed)
+
+                run["stub_requests"] = {
+                    name: {
+                        "requests": stub.requests - before[name][0],
+                        "failures": stub.failures - before[name][1],
+                    }
+                    for name, stub in stubs.items()
+                }
+                # Client-side view, including time spent in retries
+                run["upstream_latency"] = http_client.latency_stats()
+                report["runs"].append(run)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    return report
+
+
+def _run_cohort(size, stages, question_iterations, seed):
+    run = {"size": size, "stages": {}}
+
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            assignment, submissions = create_synthetic_cohort(
+                size,
+                texts=synthetic_texts(size, seed=seed),
+                ocr_done="ocr" not in stages,
+                seed=seed
+            )
+            run["setup_s"] = round(time.perf_counter() - started, 4)
+
+            if "ocr" in stages:
+                run["stages"]["ocr"] = _bench_ocr(submissions)
+
+            if "evaluation" in stages:
+                run["stages"]["evaluation"] = _bench_evaluation(assignment)
+
+            if "questions" in stages:
+                run["stages"]["question_generation"] = bench_question_generation(
+                    assignment.teacher.user, question_iterations
+                )
+
+            run["peak_rss_mb"] = peak_rss_mb()
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+    return run
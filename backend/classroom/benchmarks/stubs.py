@@ -0,0 +1,279 @@
+"""
+Local stand-ins for the OCR, RAG and plagiarism microservices, used by the
+benchmark commands. Each stub is a threaded HTTP server on 127.0.0.1 with
+configurable latency and failure rate.
+"""
+import gzip
+import io
+import json
+import random
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from pypdf import PdfReader
+
+
+class StubServer:
+    """
+    Serve `routes` ({(method, path_prefix): handler}) until stop() is called.
+    A handler gets (path, headers, body) and returns (status, payload).
+    """
+
+    def __init__(self, routes, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None):
+        self.routes = routes
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+        return failed, delay
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _read_body(self):
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    body = b""
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            break
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                else:
+                    body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                return body
+
+            def _dispatch(self, method):
+                body = self._read_body()
+                path = urlparse(self.path).path
+
+                handler = None
+                for (route_method, prefix), candidate in stub.routes.items():
+                    matches = path == prefix or (
+                        prefix.endswith("/") and path.startswith(prefix)
+                    )
+                    if route_method == method and matches:
+                        handler = candidate
+                        break
+
+                failed, delay = stub._should_fail()
+                if delay:
+                    time.sleep(delay)
+
+                if handler is None:
+                    status, payload = 404, {"detail": "Not found"}
+                elif failed:
+                    status, payload = 503, {"detail": "Injected failure"}
+                else:
+                    status, payload = handler(path, self.headers, body)
+
+                out = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def do_DELETE(self):
+                self._dispatch("DELETE")
+
+        return Handler
+
+
+def _multipart_fields(headers, body):
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {headers.get('Content-Type')}\r\n\r\n".encode() + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = part.get_payload(decode=True)
+    return fields
+
+
+def _page_note(page):
+    for annotation in page.get("/Annots") or []:
+        annotation = annotation.get_object()
+        if annotation.get("/Subtype") == "/Text":
+            return str(annotation.get("/Contents") or "")
+    return None
+
+
+def _ocr_pdf(path, headers, body):
+    # Scanned pages of synthetic PDFs (see cohorts.synthetic_pdf) are
+    # "OCR'd" by reading the note that carries their text, other pages by
+    # reading their text layer. Anything that isn't a PDF is read as text,
+    # one page per form feed.
+    content = _multipart_fields(headers, body).get("file") or b""
+    if content.startswith(b"%PDF"):
+        reader = PdfReader(io.BytesIO(content))
+        pages = []
+        for page in reader.pages:
+            note = _page_note(page)
+            pages.append(note if note is not None else page.extract_text() or "")
+    else:
+        pages = content.decode("utf-8", "ignore").split("\f")
+    return 200, {
+        "pages": [
+            {"page_number": number, "extracted_text": text}
+            for number, text in enumerate(pages, start=1)
+        ]
+    }
+
+
+def _rag_score(path, headers, body):
+    form = parse_qs(body.decode())
+    text = (form.get("extracted_text") or [""])[0]
+    return 200, {"success": True, "score": _synthetic_score(text)}
+
+
+def _rag_score_batch(path, headers, body):
+    request = json.loads(body)
+    results = []
+    for item in request.get("items", []):
+        text = item.get("extracted_text") or ""
+        if text.strip():
+            results.append({"id": item["id"], "success": True, "score": _synthetic_score(text)})
+        else:
+            results.append({"id": item["id"], "success": False, "error": "empty text"})
+    return 200, {"success": True, "results": results}
+
+
+def _synthetic_score(text):
+    return 5 + len(text) % 5
+
+
+def _rag_generate_questions(path, headers, body):
+    request = json.loads(body or b"{}")
+    total = int(request.get("num_questions", 5))
+    return 200, {
+        "difficulty": request.get("difficulty"),
+        "total_questions": total,
+        "questions": [
+            {"question_number": i, "question": f"Synthetic question {i}?"}
+            for i in range(1, total + 1)
+        ]
+    }
+
+
+def _plagiarism_check(path, headers, body):
+    request = json.loads(body)
+    cross_only = request.get("pair_scope") == "cross"
+    copies = {}
+    for item in request.get("assignments", []):
+        copies.setdefault(item["extracted_text"], []).append(item)
+
+    results = []
+    for item in request.get("assignments", []):
+        others = [
+            other for other in copies[item["extracted_text"]]
+            if other is not item and (
+                not cross_only or other.get("shard_group") != item.get("shard_group")
+            )
+        ]
+        copied = bool(others)
+        results.append({
+            "assignment_id": item["assignment_id"],
+            "plagiarism_score": 1.0 if copied else 0.0,
+            "max_similarity": 1.0 if copied else 0.1,
+            "status": "plagiarized" if copied else "original"
+        })
+    return 200, {"success": True, "results": results}
+
+
+def ocr_stub(**options):
+    return StubServer({("POST", "/pdf"): _ocr_pdf}, **options)
+
+
+def rag_stub(**options):
+    """
+    RAG stub that remembers trained collection names, exposed as
+    `server.collections`, so listing and deleting them can be checked.
+    """
+    collections = set()
+    lock = threading.Lock()
+
+    def train(path, headers, body):
+        name = (_multipart_fields(headers, body).get("collection_name") or b"").decode()
+        with lock:
+            collections.add(name)
+        return 200, {"success": True, "message": "trained"}
+
+    def delete(path, headers, body):
+        name = path.rsplit("/", 1)[-1]
+        with lock:
+            collections.discard(name)
+        return 200, {"success": True}
+
+    def list_collections(path, headers, body):
+        with lock:
+            return 200, {"collections": sorted(collections)}
+
+    server = StubServer({
+        ("POST", "/train"): train,
+        ("POST", "/score"): _rag_score,
+        ("POST", "/score/batch"): _rag_score_batch,
+        ("POST", "/generate-questions"): _rag_generate_questions,
+        ("GET", "/collections"): list_collections,
+        ("DELETE", "/collection/"): delete,
+    }, **options)
+    server.collections = collections
+    return server
+
+
+def plagiarism_stub(**options):
+    return StubServer({("POST", "/plagiarism/check"): _plagiarism_check}, **options)
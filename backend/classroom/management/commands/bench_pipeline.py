@@ -0,0 +1,138 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from classroom.benchmarks.cohorts import COHORT_SIZES
+from classroom.benchmarks.pipeline import run_pipeline_benchmark
+
+STAGES = ["ocr", "evaluation", "questions"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the OCR, deadline evaluation and question generation "
+        "pipeline end to end against local OCR/RAG/plagiarism stubs. "
+        "Cohorts are created inside transactions that are rolled back. "
+        "Each size runs in its own process so peak_rss_mb is per cohort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=COHORT_SIZES,
+            help="Cohort sizes to benchmark"
+        )
+        parser.add_argument(
+            "--stages",
+            nargs="+",
+            choices=STAGES,
+            default=STAGES,
+            help="Pipeline stages to run"
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Base stub response latency in seconds"
+        )
+        parser.add_argument(
+            "--jitter",
+            type=float,
+            default=0.0,
+            help="Extra random stub latency, uniform in [0, jitter] seconds"
+        )
+        parser.add_argument(
+            "--failure-rate",
+            type=float,
+            default=0.0,
+            help="Fraction of stub requests answered with a 503"
+        )
+        parser.add_argument(
+            "--question-requests",
+            type=int,
+            default=10,
+            help="Question generation requests per cohort"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output",
+            help="Also write the JSON report to this file"
+        )
+        parser.add_argument(
+            "--in-process",
+            action="store_true",
+            help=(
+                "Run every size in this process; peak_rss_mb then includes "
+                "the cohorts run before"
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options["in_process"] or len(options["sizes"]) == 1:
+            report = self._run_in_process(options)
+        else:
+            report = self._run_per_size(options)
+
+        out = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(out)
+        self.stdout.write(out)
+
+    def _run_per_size(self, options):
+        """
+        Run each size in a fresh process and merge their reports, so each
+        run's peak_rss_mb is that cohort's alone.
+        """
+        report = None
+
+        for size in options["sizes"]:
+            fd, output = tempfile.mkstemp(prefix="bench_pipeline_", suffix=".json")
+            os.close(fd)
+            try:
+                result = subprocess.run([
+                    sys.executable, "-m", "django", "bench_pipeline",
+                    "--in-process",
+                    "--sizes", str(size),
+                    "--stages", *options["stages"],
+                    "--latency", str(options["latency"]),
+                    "--jitter", str(options["jitter"]),
+                    "--failure-rate", str(options["failure_rate"]),
+                    "--question-requests", str(options["question_requests"]),
+                    "--seed", str(options["seed"]),
+                    "--output", output,
+                ], stdout=subprocess.DEVNULL)
+                if result.returncode != 0:
+                    raise CommandError(f"Benchmark of size {size} failed")
+
+                with open(output) as f:
+                    size_report = json.load(f)
+            finally:
+                os.remove(output)
+
+            if report is None:
+                report = size_report
+            else:
+                report["runs"].extend(size_report["runs"])
+
+        return report
+
+    def _run_in_process(self, options):
+        return run_pipeline_benchmark(
+            sizes=options["sizes"],
+            stages=options["stages"],
+            stub_options={
+                "latency": options["latency"],
+                "jitter": options["jitter"],
+                "failure_rate": options["failure_rate"],
+                "seed": options["seed"],
+            },
+            question_iterations=options["question_requests"],
+            seed=options["seed"]
+        )
@@ -0,0 +1,70 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from classroom.benchmarks.cohorts import create_synthetic_cohort
+from classroom.utils.plagiarism_persistence import save_plagiarism_results
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark save_plagiarism_results against synthetic cohorts. "
+        "All rows are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10000],
+            help="Cohort sizes to benchmark"
+        )
+
+    def handle(self, *args, **options):
+        report = [self._run(size) for size in options["sizes"]]
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def _run(self, size):
+        result = {}
+
+        try:
+            with transaction.atomic():
+                assignment, submissions = create_synthetic_cohort(size)
+
+                response = {
+                    "success": True,
+                    "results": [
+                        {
+                            "assignment_id": str(sub.id),
+                            "plagiarism_score": (i % 10) / 10,
+                            "max_similarity": (i % 7) / 7,
+                            "status": "original" if i % 10 < 5 else "suspicious"
+                        }
+                        for i, sub in enumerate(submissions)
+                    ]
+                }
+
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    save_plagiarism_results(response)
+                    elapsed = time.perf_counter() - started
+
+                result = {
+                    "results": size,
+                    "seconds": round(elapsed, 4),
+                    "rows_per_second": round(size / elapsed, 1) if elapsed else None,
+                    "queries": len(queries),
+                }
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        return result
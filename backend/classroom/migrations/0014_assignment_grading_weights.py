@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0013_remove_studentassignment_marks_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='correctness_weight',
+            field=models.FloatField(default=0.6),
+        ),
+        migrations.AddField(
+            model_name='assignment',
+            name='plagiarism_weight',
+            field=models.FloatField(default=0.4),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0014_assignment_grading_weights'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentassignment',
+            name='evaluation_stage',
+            field=models.CharField(choices=[('pending', 'Pending'), ('plagiarism_done', 'Plagiarism Done'), ('rag_done', 'RAG Done'), ('finalised', 'Finalised')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0015_studentassignment_evaluation_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlagiarismFingerprint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sketch', models.JSONField(blank=True, default=list)),
+                ('max_similarity', models.FloatField(default=0.0)),
+                ('status', models.CharField(choices=[('original', 'Original'), ('suspicious', 'Suspicious'), ('plagiarized', 'Plagiarized')], default='original', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_fingerprints', to='classroom.assignment')),
+                ('matched_submission', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='classroom.studentassignment')),
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plagiarism_fingerprint', to='classroom.studentassignment')),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_bottom_k_fingerprints(apps, schema_editor):
+    # Old sketches cannot be compared with MinHash signatures; the deadline
+    # evaluation re-indexes any submission without a fingerprint.
+    PlagiarismFingerprint = apps.get_model('classroom', 'PlagiarismFingerprint')
+    PlagiarismFingerprint.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0016_plagiarismfingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_bottom_k_fingerprints, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='plagiarismfingerprint',
+            name='sketch',
+        ),
+        migrations.AddField(
+            model_name='plagiarismfingerprint',
+            name='signature',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='PlagiarismBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='classroom.assignment')),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='classroom.plagiarismfingerprint')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignment', 'key'], name='classroom_p_assignm_c6e376_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:34
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0017_plagiarism_minhash_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcrCacheEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content_sha256', models.CharField(max_length=64, unique=True)),
+                ('extracted_text', models.TextField(blank=True)),
+                ('page_count', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studentassignment',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentassignment',
+            name='exact_copy_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='classroom.studentassignment'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:40
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0018_ocr_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrcacheentry',
+            name='pages',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='SubmissionPage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('source', models.CharField(choices=[('text_layer', 'Text Layer'), ('ocr', 'OCR')], default='ocr', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='classroom.studentassignment')),
+            ],
+            options={
+                'ordering': ['page_number'],
+                'unique_together': {('submission', 'page_number')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0019_submission_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='evaluation_report',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
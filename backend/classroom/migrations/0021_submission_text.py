@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:42
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_text_to_side_table(apps, schema_editor):
+    StudentAssignment = apps.get_model('classroom', 'StudentAssignment')
+    SubmissionText = apps.get_model('classroom', 'SubmissionText')
+
+    batch = []
+    rows = (
+        StudentAssignment.objects
+        .filter(extracted_text__isnull=False)
+        .values_list('id', 'extracted_text')
+        .iterator(chunk_size=500)
+    )
+    for submission_id, text in rows:
+        batch.append(SubmissionText(
+            submission_id=submission_id,
+            data=zlib.compress(text.encode('utf-8'), 6),
+            length=len(text)
+        ))
+        if len(batch) >= 500:
+            SubmissionText.objects.bulk_create(batch)
+            batch = []
+    SubmissionText.objects.bulk_create(batch)
+
+
+def move_text_back(apps, schema_editor):
+    StudentAssignment = apps.get_model('classroom', 'StudentAssignment')
+    SubmissionText = apps.get_model('classroom', 'SubmissionText')
+
+    for stored in SubmissionText.objects.iterator(chunk_size=500):
+        StudentAssignment.objects.filter(id=stored.submission_id).update(
+            extracted_text=zlib.decompress(bytes(stored.data)).decode('utf-8')
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0020_assignment_evaluation_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionText',
+            fields=[
+                ('submission', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stored_text', serialize=False, to='classroom.studentassignment')),
+                ('data', models.BinaryField()),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(move_text_to_side_table, move_text_back),
+        migrations.RemoveField(
+            model_name='studentassignment',
+            name='extracted_text',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0021_submission_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='rag_training_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='assignment',
+            name='status',
+            field=models.CharField(blank=True, choices=[('DRAFT', 'Draft'), ('TRAINING', 'Training'), ('ACTIVE', 'Active'), ('FAILED', 'Failed')], default='DRAFT', max_length=20, null=True),
+        ),
+    ]
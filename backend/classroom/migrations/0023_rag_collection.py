@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:46
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0022_assignment_rag_training'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RagCollection',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content_sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=63, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('training', 'Training'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('training_started_at', models.DateTimeField(blank=True, null=True)),
+                ('trained_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0023_rag_collection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragcollection',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
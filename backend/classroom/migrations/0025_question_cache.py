@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:49
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0024_rag_collection_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionCacheEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content_sha256', models.CharField(max_length=64)),
+                ('num_questions', models.PositiveIntegerField()),
+                ('difficulty', models.CharField(max_length=20)),
+                ('response', models.JSONField(default=dict)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('content_sha256', 'num_questions', 'difficulty')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:50
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0025_question_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RagScoreCacheEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('collection_name', models.CharField(max_length=63)),
+                ('text_sha256', models.CharField(max_length=64)),
+                ('response', models.JSONField(default=dict)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('collection_name', 'text_sha256')},
+            },
+        ),
+    ]
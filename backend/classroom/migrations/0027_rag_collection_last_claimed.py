@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0026_rag_score_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ragcollection',
+            name='last_claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
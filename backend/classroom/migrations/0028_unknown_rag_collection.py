@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 12:13
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0027_rag_collection_last_claimed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnknownRagCollection',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=63, unique=True)),
+                ('first_seen_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
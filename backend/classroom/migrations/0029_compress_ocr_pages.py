@@ -0,0 +1,128 @@
+# Generated by Django 5.2.7 on 2026-10-17 16:05
+
+import json
+import zlib
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+PAGE_SEPARATOR = '\n\n'
+
+
+def _compress(text):
+    return zlib.compress(text.encode('utf-8'), 6)
+
+
+def _decompress(data):
+    return zlib.decompress(bytes(data)).decode('utf-8')
+
+
+def compress_pages(apps, schema_editor):
+    SubmissionPage = apps.get_model('classroom', 'SubmissionPage')
+    SubmissionText = apps.get_model('classroom', 'SubmissionText')
+    OcrCacheEntry = apps.get_model('classroom', 'OcrCacheEntry')
+
+    for page in SubmissionPage.objects.only('id', 'text').iterator(chunk_size=500):
+        SubmissionPage.objects.filter(id=page.id).update(data=_compress(page.text))
+
+    # Texts stored before submissions kept pages become a single page
+    batch = []
+    rows = (
+        SubmissionText.objects
+        .filter(~Exists(SubmissionPage.objects.filter(submission_id=OuterRef('submission_id'))))
+        .iterator(chunk_size=500)
+    )
+    for stored in rows:
+        batch.append(SubmissionPage(
+            submission_id=stored.submission_id,
+            page_number=1,
+            data=bytes(stored.data),
+            source='ocr'
+        ))
+        if len(batch) >= 500:
+            SubmissionPage.objects.bulk_create(batch)
+            batch = []
+    SubmissionPage.objects.bulk_create(batch)
+
+    for entry in OcrCacheEntry.objects.iterator(chunk_size=500):
+        pages = entry.pages or [{'page_number': 1, 'extracted_text': entry.extracted_text}]
+        OcrCacheEntry.objects.filter(id=entry.id).update(
+            data=_compress(json.dumps(pages)),
+            page_count=len(pages)
+        )
+
+
+def decompress_pages(apps, schema_editor):
+    StudentAssignment = apps.get_model('classroom', 'StudentAssignment')
+    SubmissionPage = apps.get_model('classroom', 'SubmissionPage')
+    SubmissionText = apps.get_model('classroom', 'SubmissionText')
+    OcrCacheEntry = apps.get_model('classroom', 'OcrCacheEntry')
+
+    for page in SubmissionPage.objects.only('id', 'data').iterator(chunk_size=500):
+        SubmissionPage.objects.filter(id=page.id).update(text=_decompress(page.data))
+
+    submission_ids = (
+        StudentAssignment.objects
+        .filter(Exists(SubmissionPage.objects.filter(submission_id=OuterRef('pk'))))
+        .values_list('id', flat=True)
+        .iterator(chunk_size=500)
+    )
+    for submission_id in submission_ids:
+        text = PAGE_SEPARATOR.join(
+            SubmissionPage.objects
+            .filter(submission_id=submission_id)
+            .order_by('page_number')
+            .values_list('text', flat=True)
+        )
+        SubmissionText.objects.create(
+            submission_id=submission_id,
+            data=_compress(text),
+            length=len(text)
+        )
+
+    for entry in OcrCacheEntry.objects.iterator(chunk_size=500):
+        pages = json.loads(_decompress(entry.data))
+        OcrCacheEntry.objects.filter(id=entry.id).update(
+            pages=pages,
+            extracted_text=PAGE_SEPARATOR.join(
+                page.get('extracted_text', '') for page in pages
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classroom', '0028_unknown_rag_collection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissionpage',
+            name='data',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='ocrcacheentry',
+            name='data',
+            field=models.BinaryField(default=b''),
+            preserve_default=False,
+        ),
+        migrations.RunPython(compress_pages, decompress_pages),
+        migrations.RemoveField(
+            model_name='submissionpage',
+            name='text',
+        ),
+        migrations.RemoveField(
+            model_name='ocrcacheentry',
+            name='extracted_text',
+        ),
+        migrations.RemoveField(
+            model_name='ocrcacheentry',
+            name='pages',
+        ),
+        migrations.DeleteModel(
+            name='SubmissionText',
+        ),
+    ]
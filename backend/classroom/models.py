@@ -1,9 +1,24 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+from django.utils.functional import cached_property
+import json
 import uuid
+import zlib
 from teacher.models import Teacher
 
+# Joins a submission's page texts into its extracted text
+PAGE_SEPARATOR = "\n\n"
+
+
+def compress_text(text):
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(data):
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
 class Classroom(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     teacher = models.ForeignKey(
@@ -117,10 +132,23 @@ class Assignment(models.Model):
 
     rag_trained = models.BooleanField(default=False, blank=True, null=True)
     rag_trained_at = models.DateTimeField(blank=True, null=True)
+    rag_training_error = models.TextField(blank=True, null=True)
+
+    # Grading weights (final = plagiarism * w1 + correctness * w2)
+    plagiarism_weight = models.FloatField(default=0.4)
+    correctness_weight = models.FloatField(default=0.6)
+
+    # Written by the deadline evaluation, e.g. how long it waited on OCR
+    evaluation_report = models.JSONField(default=dict, blank=True)
 
     status = models.CharField(
         max_length=20,
-        choices=[('DRAFT', 'Draft'), ('ACTIVE', 'Active')],
+        choices=[
+            ('DRAFT', 'Draft'),
+            ('TRAINING', 'Training'),
+            ('ACTIVE', 'Active'),
+            ('FAILED', 'Failed'),
+        ],
         default='DRAFT',
         null=True,
         blank=True
@@ -150,6 +178,14 @@ class StudentAssignment(models.Model):
         ('late', 'Late Submission'),
     ]
 
+    # Deadline evaluation checkpoints; retries resume from the last stage reached
+    EVALUATION_STAGE_CHOICES = [
+        ('pending', 'Pending'),
+        ('plagiarism_done', 'Plagiarism Done'),
+        ('rag_done', 'RAG Done'),
+        ('finalised', 'Finalised'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     assignment = models.ForeignKey(
         'classroom.Assignment',
@@ -162,8 +198,17 @@ class StudentAssignment(models.Model):
         related_name='submitted_assignments'
     )
     submitted_file = models.FileField(upload_to='assignments/submissions/', blank=True, null=True)
+    # SHA-256 of the submitted file, used as the OCR cache key
+    content_sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Earlier submission of the same assignment with byte-identical content
+    exact_copy_of = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
-    extracted_text = models.TextField(blank=True, null=True)
     ocr_status = models.CharField(max_length=20, default='pending')
     ocr_error = models.TextField(blank=True, null=True)
     submitted_at = models.DateTimeField(blank=True, null=True)
@@ -173,6 +218,11 @@ class StudentAssignment(models.Model):
     correctness_score = models.FloatField(blank=True, null=True)
     correctness_status = models.CharField(blank=True, null=True)
     final_score = models.FloatField(blank=True, null=True)
+    evaluation_stage = models.CharField(
+        max_length=20,
+        choices=EVALUATION_STAGE_CHOICES,
+        default='pending'
+    )
     
     class Meta:
         unique_together = ('assignment', 'student')
@@ -184,3 +234,220 @@ class StudentAssignment(models.Model):
     def is_past_deadline(self):
         return timezone.now() > self.assignment.deadline
 
+    @property
+    def extracted_text(self):
+        """
+        OCR text, or None before OCR: the submission's pages joined in
+        order. The pages are loaded once per instance; use
+        classroom.utils.submission_text.with_extracted_text when reading
+        many rows. Written through classroom.utils.submission_pages.
+        """
+        if "pages" not in getattr(self, "_prefetched_objects_cache", {}):
+            models.prefetch_related_objects([self], "pages")
+        pages = self.pages.all()
+        if not pages:
+            return None
+        return PAGE_SEPARATOR.join(page.text for page in pages)
+
+
+class PlagiarismFingerprint(models.Model):
+    STATUS_CHOICES = [
+        ('original', 'Original'),
+        ('suspicious', 'Suspicious'),
+        ('plagiarized', 'Plagiarized'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    submission = models.OneToOneField(
+        'classroom.StudentAssignment',
+        on_delete=models.CASCADE,
+        related_name='plagiarism_fingerprint'
+    )
+    assignment = models.ForeignKey(
+        'classroom.Assignment',
+        on_delete=models.CASCADE,
+        related_name='plagiarism_fingerprints'
+    )
+    # MinHash signature, see classroom.utils.minhash
+    signature = models.JSONField(default=list, blank=True)
+
+    # Provisional result, updated as other submissions are indexed
+    max_similarity = models.FloatField(default=0.0)
+    matched_submission = models.ForeignKey(
+        'classroom.StudentAssignment',
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='original')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.submission_id} ({self.status}, {self.max_similarity:.2f})"
+
+class PlagiarismBand(models.Model):
+    """
+    One LSH bucket key of a fingerprint's signature. Submissions of the same
+    assignment sharing a key are candidate near-duplicates.
+    """
+    fingerprint = models.ForeignKey(
+        'classroom.PlagiarismFingerprint',
+        on_delete=models.CASCADE,
+        related_name='bands'
+    )
+    assignment = models.ForeignKey(
+        'classroom.Assignment',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    key = models.CharField(max_length=32)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["assignment", "key"]),
+        ]
+
+    def __str__(self):
+        return f"{self.fingerprint_id} [{self.key}]"
+
+class OcrCacheEntry(models.Model):
+    """
+    OCR output of a file, keyed by the file's SHA-256. Entries unused for
+    OCR_CACHE_TTL_DAYS, or beyond OCR_CACHE_MAX_ENTRIES by last use, are
+    evicted by the evict_ocr_cache task.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_sha256 = models.CharField(max_length=64, unique=True)
+    # zlib-compressed JSON of [{"page_number", "extracted_text", "source"}, ...]
+    data = models.BinaryField()
+    page_count = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @staticmethod
+    def compress(pages):
+        return compress_text(json.dumps(pages))
+
+    @cached_property
+    def pages(self):
+        return json.loads(decompress_text(self.data))
+
+    def __str__(self):
+        return f"{self.content_sha256[:12]} ({self.page_count} pages, {self.hits} hits)"
+
+class QuestionCacheEntry(models.Model):
+    """
+    Response of the RAG question generator for a resource PDF (by SHA-256)
+    and request parameters. The least recently used entries beyond
+    QUESTION_CACHE_MAX_ENTRIES are evicted as new ones are stored.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_sha256 = models.CharField(max_length=64)
+    num_questions = models.PositiveIntegerField()
+    difficulty = models.CharField(max_length=20)
+    response = models.JSONField(default=dict)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ('content_sha256', 'num_questions', 'difficulty')
+
+    def __str__(self):
+        return f"{self.content_sha256[:12]} {self.num_questions} {self.difficulty} ({self.hits} hits)"
+
+class RagScoreCacheEntry(models.Model):
+    """
+    RAG /score response for a text against a collection, keyed by the
+    SHA-256 of the normalised text. Dropped when the collection is
+    retrained or deleted.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    collection_name = models.CharField(max_length=63)
+    text_sha256 = models.CharField(max_length=64)
+    response = models.JSONField(default=dict)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('collection_name', 'text_sha256')
+
+    def __str__(self):
+        return f"{self.collection_name} {self.text_sha256[:12]} ({self.hits} hits)"
+
+class SubmissionPage(models.Model):
+    """
+    zlib-compressed text of one page of a submission.
+    StudentAssignment.extracted_text is these pages joined in order.
+    """
+    SOURCE_CHOICES = [
+        ('text_layer', 'Text Layer'),
+        ('ocr', 'OCR'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    submission = models.ForeignKey(
+        'classroom.StudentAssignment',
+        on_delete=models.CASCADE,
+        related_name='pages'
+    )
+    page_number = models.PositiveIntegerField()
+    data = models.BinaryField()
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='ocr')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('submission', 'page_number')
+        ordering = ['page_number']
+
+    @cached_property
+    def text(self):
+        return decompress_text(self.data)
+
+    def __str__(self):
+        return f"{self.submission_id} p{self.page_number}"
+
+class RagCollection(models.Model):
+    """
+    A trained RAG collection, keyed by the SHA-256 of the resource PDF it
+    was trained from. Assignments with the same PDF share it through
+    Assignment.rag_collection; it is deleted when none refers to it.
+    Collections trained for a question preview carry an expires_at until an
+    assignment is created from the same PDF.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('training', 'Training'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    content_sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=63, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    training_started_at = models.DateTimeField(blank=True, null=True)
+    trained_at = models.DateTimeField(blank=True, null=True)
+    # Set while the collection only backs a question preview
+    expires_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    # Last time an assignment or preview asked for the collection
+    last_claimed_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+class UnknownRagCollection(models.Model):
+    """
+    A collection on the RAG service with this deployment's name prefix that
+    no RagCollection or assignment accounts for, and when the janitor first
+    saw it. It is only deleted once it is still unknown a grace period later.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=63, unique=True)
+    first_seen_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} (seen {self.first_seen_at:%Y-%m-%d %H:%M})"
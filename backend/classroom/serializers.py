@@ -163,6 +163,22 @@ class StudentJoinRequestSerializer(serializers.ModelSerializer):
             return f"{teacher.first_name} {teacher.last_name}"
         return None
     
+def validate_grading_weights(attrs, instance=None):
+    weights = {}
+    for field in ('plagiarism_weight', 'correctness_weight'):
+        if field in attrs:
+            weights[field] = attrs[field]
+        elif instance is not None:
+            weights[field] = getattr(instance, field)
+        else:
+            weights[field] = Assignment._meta.get_field(field).default
+
+    if any(weight < 0 for weight in weights.values()):
+        raise serializers.ValidationError("Grading weights cannot be negative.")
+
+    if abs(sum(weights.values()) - 1.0) > 1e-6:
+        raise serializers.ValidationError("Grading weights must add up to 1.")
+
 class AssignmentSerializer(serializers.ModelSerializer):
     classroom_name = serializers.CharField(source='classroom.name', read_only=True)
     teacher_name = serializers.SerializerMethodField()
@@ -184,12 +200,18 @@ class AssignmentSerializer(serializers.ModelSerializer):
             # workflow
             'questionMethod',
             'questions_ready',
+            'status',
 
             # RAG metadata (read-only)
             'rag_collection',
             'rag_trained',
             'rag_trained_at',
 
+            # grading weights
+            'plagiarism_weight',
+            'correctness_weight',
+            'evaluation_report',
+
             # time
             'deadline',
             'created_at',
@@ -199,9 +221,11 @@ class AssignmentSerializer(serializers.ModelSerializer):
             'teacher',
             'created_at',
             'questions_ready',
+            'status',
             'rag_collection',
             'rag_trained',
             'rag_trained_at',
+            'evaluation_report',
         ]
 
     def get_teacher_name(self, obj):
@@ -238,6 +262,8 @@ class AssignmentSerializer(serializers.ModelSerializer):
                 "questionMethod": "Invalid generation mode."
             })
 
+        validate_grading_weights(attrs, self.instance)
+
         return attrs
 
     def create(self, validated_data):
@@ -275,7 +301,6 @@ class StudentAssignmentSerializer(serializers.ModelSerializer):
             "submitted_at",
 
             # Newly added OCR fields:
-            "extracted_text",
             "ocr_status",
             "ocr_error",
 
@@ -288,7 +313,6 @@ class StudentAssignmentSerializer(serializers.ModelSerializer):
             "status",
             "submitted_at",
 
-            "extracted_text",
             "ocr_status",
             "ocr_error",
 
@@ -318,6 +342,12 @@ class StudentAssignmentSerializer(serializers.ModelSerializer):
         if timezone.now() > assignment.deadline:
             raise serializers.ValidationError("Deadline has passed. Submission not allowed.")
 
+        # Nothing can be scored until the assignment's RAG collection is ready
+        if assignment.status == "TRAINING":
+            raise serializers.ValidationError("This assignment is still being prepared. Please try again shortly.")
+        if assignment.status != "ACTIVE":
+            raise serializers.ValidationError("This assignment is not accepting submissions.")
+
         validated_data["student"] = student
         validated_data["submitted_at"] = timezone.now()
         validated_data["status"] = "submitted"
@@ -336,6 +366,9 @@ class StudentSubmissionStatusSerializer(serializers.Serializer):
     submitted_at = serializers.DateTimeField(allow_null=True)
     final_score = serializers.FloatField(allow_null=True)
     plagiarism_score = serializers.FloatField(allow_null=True)
+    provisional_similarity = serializers.FloatField(allow_null=True)
+    provisional_plagiarism_status = serializers.CharField(allow_null=True)
+    exact_copy_of = serializers.UUIDField(allow_null=True)
 
 class StudentAssignmentCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -368,7 +401,9 @@ class GenerateQuestionsSerializer(serializers.Serializer):
     difficulty = serializers.ChoiceField(
         choices=["easy", "moderate", "hard"]
     )
-    
+    # Skip the cache and generate a fresh set
+    refresh = serializers.BooleanField(required=False, default=False)
+
 class GeneratedAssignmentCreateSerializer(serializers.Serializer):
     title = serializers.CharField()
     description = serializers.CharField(required=False, allow_blank=True)
@@ -379,4 +414,28 @@ class GeneratedAssignmentCreateSerializer(serializers.Serializer):
         child=serializers.CharField()
     )
 
+class AssignmentWeightsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Assignment
+        fields = ['plagiarism_weight', 'correctness_weight']
+
+    def validate(self, attrs):
+        validate_grading_weights(attrs, self.instance)
+        return attrs
 
+class AssignmentTrainingStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Assignment
+        fields = [
+            'id',
+            'status',
+            'rag_trained',
+            'rag_trained_at',
+            'rag_training_error',
+        ]
+        read_only_fields = fields
+
+class SubmissionPageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubmissionPage
+        fields = ['page_number', 'text', 'source', 'updated_at']
@@ -1,73 +1,261 @@
-from .utils.rag_client import score_assignment_text
-from django.db import transaction
+from .utils.rag_client import score_many
+from .utils.rag_score_cache import normalised_text_sha256, get_cached_scores, store_scores
+from .utils.plag_client import (
+    run_plagiarism_check,
+    run_plagiarism_check_streamed,
+    run_sharded_plagiarism_check,
+    build_plagiarism_payload,
+    iter_plagiarism_payload,
+    PLAG_STREAM_REQUESTS,
+    PLAG_STREAM_CHUNK_SIZE,
+    PLAG_SHARD_BLOCK_SIZE,
+)
+from .utils.plagiarism_index import build_indexed_plagiarism_results
+from .utils.minhash import minhash_signature, find_candidate_pairs, run_local_plagiarism_check
+from .utils.submission_text import with_extracted_text
+from decouple import config
 from django.db import transaction
+from django.db.models import F, Value, FloatField, DecimalField
+from django.db.models.functions import Cast, Coalesce, Greatest, Least, Round
 from .models import StudentAssignment
 import logging
 logger = logging.getLogger(__name__)
 
 
-PLAG_WEIGHT = 0.4
-CORRECTNESS_WEIGHT = 0.6
+MAX_FINAL_SCORE = 10.0
+
+# "service": send the cohort to the plagiarism microservice at the deadline
+# "incremental": merge the per-submission index built as OCR completes
+# "local": run the in-process MinHash engine over the cohort
+PLAGIARISM_ENGINE = config("PLAGIARISM_ENGINE", default="service")
+
+# Only send LSH candidate clusters to the plagiarism service. Off by default:
+# submissions outside every cluster are marked original without the service
+# seeing them, and heavily reworded copies can miss the LSH buckets
+PLAGIARISM_PREFILTER = config("PLAGIARISM_PREFILTER", default=False, cast=bool)
+
+def run_plagiarism(assignment, submissions_qs):
+    """
+    Produce plagiarism results for the cohort in the plagiarism service's
+    response shape, using the configured engine. If the service is down the
+    local MinHash engine is used instead.
+    """
+    if PLAGIARISM_ENGINE == "incremental":
+        return build_indexed_plagiarism_results(assignment, submissions_qs)
+
+    if PLAGIARISM_ENGINE == "local":
+        return run_local_plagiarism_check(assignment.id, cohort_signatures(submissions_qs))
+
+    signatures = None
+    try:
+        if not PLAGIARISM_PREFILTER:
+            return _run_service_plagiarism_check(assignment, submissions_qs)
+
+        signatures = cohort_signatures(submissions_qs)
+        return _run_prefiltered_plagiarism_check(assignment, submissions_qs, signatures)
+
+    except RuntimeError:
+        logger.exception("[PLAG FALLBACK] Plagiarism service failed, using local engine")
+        if signatures is None:
+            signatures = cohort_signatures(submissions_qs)
+        return run_local_plagiarism_check(assignment.id, signatures)
+
+def cohort_signatures(submissions_qs):
+    """
+    MinHash signature of every submission with text, keyed by submission id.
+    Rows are streamed so only the signatures stay in memory.
+    """
+    rows = with_extracted_text(submissions_qs, "id").iterator(
+        chunk_size=PLAG_STREAM_CHUNK_SIZE
+    )
+    return {
+        str(sub.id): minhash_signature(sub.extracted_text)
+        for sub in rows
+        if sub.extracted_text
+    }
+
+def _run_service_plagiarism_check(assignment, submissions_qs):
+    # Sharded requests are streamed too when PLAG_STREAM_REQUESTS is set
+    if PLAG_SHARD_BLOCK_SIZE and submissions_qs.count() > 2 * PLAG_SHARD_BLOCK_SIZE:
+        return run_sharded_plagiarism_check(
+            assignment_id=str(assignment.id),
+            student_assignments=submissions_qs,
+            block_size=PLAG_SHARD_BLOCK_SIZE
+        )
+
+    if PLAG_STREAM_REQUESTS:
+        return run_plagiarism_check_streamed(
+            assignment_id=str(assignment.id),
+            submissions=iter_plagiarism_payload(submissions_qs)
+        )
+
+    return run_plagiarism_check(
+        assignment_id=str(assignment.id),
+        submissions=build_plagiarism_payload(assignment, submissions_qs)
+    )
+
+def _run_prefiltered_plagiarism_check(assignment, submissions_qs, signatures):
+    candidate_ids = {
+        submission_id
+        for pair in find_candidate_pairs(signatures)
+        for submission_id in pair
+    }
+
+    logger.info(f"[PLAG CANDIDATES] {len(candidate_ids)} of {len(signatures)}")
+
+    # Nothing shares an LSH bucket with these, so they are original
+    results = [
+        {
+            "assignment_id": submission_id,
+            "plagiarism_score": 0.0,
+            "max_similarity": 0.0,
+            "status": "original"
+        }
+        for submission_id in signatures
+        if submission_id not in candidate_ids
+    ]
+
+    if candidate_ids:
+        response = _run_service_plagiarism_check(
+            assignment,
+            submissions_qs.filter(id__in=candidate_ids)
+        )
+        if not response.get("success"):
+            return response
+        results.extend(response.get("results", []))
+
+    return {"success": True, "results": results}
 
 def run_rag_grading(assignment, eligible_submissions):
-    if not assignment.rag_collection:
+    """
+    Score a batch of submissions through the batched RAG client.
+    Texts scored against the collection before come from the score cache,
+    and identical texts in the batch are scored once.
+    Failures are recorded on each submission instead of being raised, so one
+    bad submission never blocks the rest of the cohort.
+    """
+    collection_name = assignment.rag_collection
+    if not collection_name:
         raise RuntimeError("Assignment has no RAG collection")
 
+    submissions = {}
+    texts = {}
     for submission in eligible_submissions:
-        try:
-            if not submission.extracted_text:
-                logger.warning(f"No extracted text for {submission.id}")
-                continue
-
-            rag_response = score_assignment_text(
-                collection_name=assignment.rag_collection,
-                extracted_text=submission.extracted_text
-            )
-
-            if not rag_response.get("success"):
-                logger.error(f"RAG failed: {rag_response}")
-                submission.correctness_status = "failed"
-                submission.save(update_fields=["correctness_status"])
-                continue
-
-            correctness_score = rag_response["score"]
-            if correctness_score > 10:
-                correctness_score = round(correctness_score / 10, 2)
-
-            submission.correctness_score = correctness_score
-            submission.status = "processed_rag"
-            submission.correctness_status = "graded"
-
-            submission.save(
-                update_fields=["correctness_score", "status", "correctness_status"]
-            )
-
-        except Exception as e:
-            logger.exception("RAG exception")
-            submission.correctness_status = "error"
-            submission.ocr_error = str(e)
-            submission.save(update_fields=["correctness_status", "ocr_error"])
-
-def finalize_marks(assignment):
-    # Fetch everyone who has been processed by RAG
-    # Cheaters are already marked "graded" and 0, so we skip them here
-    submissions = StudentAssignment.objects.filter(
-        assignment=assignment,
-        status="processed_rag" 
+        if not submission.extracted_text:
+            logger.warning(f"No extracted text for {submission.id}")
+            continue
+        text_sha256 = normalised_text_sha256(submission.extracted_text)
+        submissions[str(submission.id)] = (submission, text_sha256)
+        texts.setdefault(text_sha256, submission.extracted_text)
+
+    responses = get_cached_scores(collection_name, texts)
+    missing = {
+        text_sha256: text
+        for text_sha256, text in texts.items()
+        if text_sha256 not in responses
+    }
+
+    logger.info(
+        f"[RAG SCORE CACHE] {len(submissions)} submissions, {len(texts)} distinct texts, "
+        f"{len(texts) - len(missing)} cached"
     )
 
-    for sub in submissions:
-        # Retrieve scores explicitly
-        plag_marks = sub.plagiarism_score or 0  # Use the specific field
-        correctness = sub.correctness_score or 0 # Use the specific field
+    if missing:
+        scored = score_many(collection_name=collection_name, texts=missing)
+        store_scores(collection_name, scored)
+        responses.update(scored)
 
-        final = (
-            plag_marks * PLAG_WEIGHT +
-            correctness * CORRECTNESS_WEIGHT
-        )
+    for submission, text_sha256 in submissions.values():
+        apply_rag_response(submission, responses[text_sha256])
+
+def apply_rag_response(submission, rag_response):
+    """
+    Store a RAG scoring response (or the exception raised while scoring)
+    on the submission.
+    """
+    if isinstance(rag_response, Exception):
+        logger.error("RAG exception", exc_info=rag_response)
+        submission.correctness_status = "error"
+        submission.ocr_error = str(rag_response)
+        submission.save(update_fields=["correctness_status", "ocr_error"])
+        return
 
-        final = round(max(0, min(final, 10)), 2)
+    if not rag_response.get("success"):
+        logger.error(f"RAG failed: {rag_response}")
+        submission.correctness_status = "failed"
+        submission.save(update_fields=["correctness_status"])
+        return
 
-        sub.final_score = final
-        sub.status = "graded" # Now they are fully graded
-        sub.save(update_fields=["final_score", "status"])
\ No newline at end of file
+    correctness_score = rag_response["score"]
+    if correctness_score > 10:
+        correctness_score = round(correctness_score / 10, 2)
+
+    submission.correctness_score = correctness_score
+    submission.status = "processed_rag"
+    submission.correctness_status = "graded"
+    submission.evaluation_stage = "rag_done"
+
+    submission.save(
+        update_fields=[
+            "correctness_score",
+            "status",
+            "correctness_status",
+            "evaluation_stage"
+        ]
+    )
+
+def final_score_expression(assignment):
+    """
+    Database-side equivalent of
+    round(clamp(plag * plagiarism_weight + correctness * correctness_weight, 0, 10), 2)
+    """
+    weighted = (
+        Coalesce(F("plagiarism_score"), Value(0.0)) * Value(assignment.plagiarism_weight) +
+        Coalesce(F("correctness_score"), Value(0.0)) * Value(assignment.correctness_weight)
+    )
+    clamped = Greatest(
+        Least(weighted, Value(MAX_FINAL_SCORE)),
+        Value(0.0),
+        output_field=FloatField()
+    )
+
+    # ROUND(x, n) is only defined for numeric on PostgreSQL
+    return Cast(
+        Round(Cast(clamped, DecimalField(max_digits=12, decimal_places=4)), 2),
+        FloatField()
+    )
+
+def zero_cheaters(assignment):
+    """
+    Grade every submission whose plagiarism marks were wiped out as 0
+    in a single UPDATE. Returns the number of rows updated.
+    """
+    return StudentAssignment.objects.filter(
+        assignment=assignment,
+        plagiarism_score__lte=0,
+        status="submitted"
+    ).update(final_score=0.0, status="graded", evaluation_stage="finalised")
+
+def finalize_marks(assignment, recompute=False):
+    """
+    Combine plagiarism and correctness scores into final_score in a single
+    UPDATE. With recompute=True submissions that were already graded from a
+    RAG score are re-finalised too, e.g. after the weights were changed.
+    Cheaters never reach RAG, so they keep their 0.
+    Returns the number of rows updated.
+    """
+    submissions = StudentAssignment.objects.filter(assignment=assignment)
+
+    if recompute:
+        submissions = submissions.filter(
+            status__in=["processed_rag", "graded"],
+            correctness_status="graded"
+        )
+    else:
+        submissions = submissions.filter(status="processed_rag")
+
+    return submissions.update(
+        final_score=final_score_expression(assignment),
+        status="graded",
+        evaluation_stage="finalised"
+    )
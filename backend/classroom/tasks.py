@@ -1,74 +1,336 @@
-from celery import shared_task
+from datetime import datetime
+
+from celery import shared_task, chord
 from django.utils import timezone
+from django.db import transaction
 from .models import Assignment, StudentAssignment
-from .utils.plag_client import run_plagiarism_check,    build_plagiarism_payload
 
 from .utils.plagiarism_persistence import save_plagiarism_results
-from .task_helpers import run_rag_grading, finalize_marks
+from .task_helpers import run_rag_grading, run_plagiarism, finalize_marks, zero_cheaters
 
 from .models import StudentAssignment
-from .utils.ocr_client import extract_text_from_pdf_file
+from .utils.ocr_client import extract_text_from_pdf_file, extract_pages_from_pdf_file
+from .utils.submission_pages import save_submission_pages, update_submission_page
+from .utils.submission_text import has_extracted_text, with_extracted_text
+from .utils.plagiarism_index import index_submission
+from .utils.ocr_cache import (
+    fingerprint_submission,
+    get_cached_ocr,
+    store_ocr_result,
+    evict_ocr_cache,
+    file_sha256,
+)
+from .utils.rag_collections import ensure_rag_collection, CollectionBusy
+from .utils.janitor import run_janitor
+from .utils.celery_scheduler import schedule_assignment_evaluation
+from .utils.evaluation_lease import (
+    LeaseLost,
+    acquire_evaluation_lease,
+    renew_evaluation_lease,
+    release_evaluation_lease,
+)
+from decouple import config
 import logging
 logger = logging.getLogger(__name__)
 
+# Submissions scored per chord subtask; each subtask keeps
+# RAG_SCORE_CONCURRENCY of them in flight at once
+RAG_CHUNK_SIZE = config("RAG_CHUNK_SIZE", default=25, cast=int)
+
+# How long a duplicate evaluation waits before checking the lease again
+EVALUATION_LEASE_RETRY_COUNTDOWN = 300
+EVALUATION_LEASE_MAX_RETRIES = 24
+
+# Times a failed RAG chord re-queues the evaluation, backing off by
+# EVALUATION_REQUEUE_COUNTDOWN * 2 ** attempt, before giving up
+EVALUATION_MAX_REQUEUES = 3
+EVALUATION_REQUEUE_COUNTDOWN = 60
+
+# At the deadline, evaluation waits up to OCR_BARRIER_MAX_WAIT seconds for
+# OCR still pending or retrying, checking every OCR_BARRIER_POLL_INTERVAL
+# seconds. Submissions still waiting after that are left out.
+OCR_BARRIER_MAX_WAIT = config("OCR_BARRIER_MAX_WAIT", default=900, cast=int)
+OCR_BARRIER_POLL_INTERVAL = config("OCR_BARRIER_POLL_INTERVAL", default=30, cast=int)
+
+# Broker priority of OCR re-dispatched by the barrier (0 is served first)
+OCR_EXPEDITE_PRIORITY = 0
+
+# OCR of a submission is retried this many times, backing off from 20s,
+# before it is marked failed; until then it is "retrying"
+OCR_MAX_RETRIES = 3
+
+RAG_TRAINING_MAX_RETRIES = 3
+
+# Seconds between checks while another worker trains the same resource PDF
+RAG_TRAINING_WAIT_INTERVAL = 30
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=30, retry_kwargs={'max_retries': 3})
 def evaluate_assignment_after_deadline(self, assignment_id):
 
     logger.info(f"[TASK START] evaluate_assignment_after_deadline | assignment_id={assignment_id}")
 
+    # Single-flight: a redelivered or duplicate run waits for the lease
+    lease_token = acquire_evaluation_lease(assignment_id)
+    if lease_token is None:
+        logger.warning(f"[LEASE HELD] Evaluation already running | assignment_id={assignment_id}")
+        raise self.retry(
+            countdown=EVALUATION_LEASE_RETRY_COUNTDOWN,
+            max_retries=EVALUATION_LEASE_MAX_RETRIES
+        )
+
+    try:
+        if not _ocr_barrier(assignment_id):
+            # Check again later without holding a worker or the lease
+            release_evaluation_lease(assignment_id, lease_token)
+            evaluate_assignment_after_deadline.apply_async(
+                args=[assignment_id],
+                countdown=OCR_BARRIER_POLL_INTERVAL
+            )
+            return "Waiting for OCR"
+
+        return _evaluate_assignment(assignment_id, lease_token)
+    except LeaseLost:
+        return _requeue_after_lease_lost(assignment_id)
+    except Exception:
+        release_evaluation_lease(assignment_id, lease_token)
+        raise
+
+
+def _requeue_after_lease_lost(assignment_id):
+    # Either another run owns the evaluation now or the lease expired with
+    # no owner. A fresh run goes through the lease again: it waits behind
+    # the owner, or resumes from the checkpoints if there is none.
+    evaluate_assignment_after_deadline.apply_async(
+        args=[assignment_id],
+        countdown=EVALUATION_LEASE_RETRY_COUNTDOWN
+    )
+    return "Lease lost"
+
+
+def _ocr_barrier(assignment_id):
+    """
+    True once no submission of the assignment is waiting for OCR, pending
+    or retrying after a failure, or once OCR_BARRIER_MAX_WAIT has passed
+    since the first check. On the first check, pending OCR tasks are sent
+    again at OCR_EXPEDITE_PRIORITY; retrying ones already have their retry
+    scheduled. The outcome is kept in
+    assignment.evaluation_report["ocr_barrier"].
+    """
+    assignment = Assignment.objects.get(id=assignment_id)
+    report = assignment.evaluation_report or {}
+    barrier = report.get("ocr_barrier")
+    now = timezone.now()
+
+    waiting = dict(
+        StudentAssignment.objects.filter(
+            assignment=assignment,
+            status="submitted",
+            ocr_status__in=["pending", "retrying"]
+        ).values_list("id", "ocr_status")
+    )
+    pending_ids = [
+        submission_id
+        for submission_id, ocr_status in waiting.items()
+        if ocr_status == "pending"
+    ]
+
+    if barrier is None or barrier.get("finished_at"):
+        barrier = {
+            "started_at": now.isoformat(),
+            "waited_on": len(waiting),
+            "expedited": 0,
+        }
+
+        # The duplicate runs first. An original still in the queue then
+        # finds the OCR done and returns straight away; one already running
+        # finishes too, and whichever saves second leaves the first's result
+        # in place (see run_ocr_for_submission)
+        for submission_id in pending_ids:
+            run_ocr_for_submission.apply_async(
+                args=[str(submission_id)],
+                priority=OCR_EXPEDITE_PRIORITY
+            )
+        barrier["expedited"] = len(pending_ids)
+
+        if pending_ids:
+            logger.info(
+                f"[OCR BARRIER] Expedited {len(pending_ids)} OCR tasks | "
+                f"assignment_id={assignment_id}"
+            )
+
+    waited = (now - datetime.fromisoformat(barrier["started_at"])).total_seconds()
+    ready = not waiting or waited >= OCR_BARRIER_MAX_WAIT
+
+    barrier["waited_seconds"] = round(waited, 1)
+    barrier["still_pending"] = len(pending_ids)
+    barrier["still_retrying"] = len(waiting) - len(pending_ids)
+    if ready:
+        barrier["finished_at"] = now.isoformat()
+        barrier["timed_out"] = bool(waiting)
+        if waiting:
+            logger.warning(
+                f"[OCR BARRIER] Gave up on {len(waiting)} submissions after "
+                f"{waited:.0f}s | assignment_id={assignment_id}"
+            )
+
+    report["ocr_barrier"] = barrier
+    Assignment.objects.filter(id=assignment.id).update(evaluation_report=report)
+
+    return ready
+
+
+def _evaluate_assignment(assignment_id, lease_token):
     assignment = Assignment.objects.get(id=assignment_id)
     logger.info(f"[ASSIGNMENT STATUS] {assignment.status}")
 
     submissions_qs = StudentAssignment.objects.filter(
         assignment=assignment,
-        status="submitted",
-        extracted_text__isnull=False
-    )
+        status="submitted"
+    ).filter(has_extracted_text())
 
     logger.info(f"[PLAG INPUT COUNT] {submissions_qs.count()}")
 
-    if submissions_qs.exists():
-        plagiarism_results = run_plagiarism_check(
-            assignment_id=str(assignment.id),
-            submissions=build_plagiarism_payload(assignment, submissions_qs)
-        )
+    # Plagiarism compares the whole cohort, so it is re-run only while some
+    # submission has not been through it yet
+    if submissions_qs.filter(evaluation_stage="pending").exists():
+        plagiarism_results = run_plagiarism(assignment, submissions_qs)
         save_plagiarism_results(plagiarism_results)
+    else:
+        logger.info("[PLAG SKIPPED] Checkpoint already reached")
 
-    cheaters = StudentAssignment.objects.filter(
-        assignment=assignment,
-        plagiarism_score__lte=0,
-        status="submitted"
-    )
-
-    logger.info(f"[CHEATERS COUNT] {cheaters.count()}")
+    cheaters_count = zero_cheaters(assignment)
 
-    for cheater in cheaters:
-        cheater.final_score = 0.0
-        cheater.status = "graded"
-        cheater.save(update_fields=["final_score", "status"])
+    logger.info(f"[CHEATERS COUNT] {cheaters_count}")
 
-    eligible_for_rag = list(
+    # Submissions already scored on a previous attempt are at "rag_done"
+    eligible_ids = list(
         StudentAssignment.objects.filter(
             assignment=assignment,
             plagiarism_score__gt=0,
             status="submitted",
-            extracted_text__isnull=False
-        )
+            evaluation_stage="plagiarism_done"
+        ).filter(has_extracted_text()).values_list("id", flat=True)
     )
 
-    logger.info(f"[RAG ELIGIBLE COUNT] {len(eligible_for_rag)}")
+    logger.info(f"[RAG ELIGIBLE COUNT] {len(eligible_ids)}")
 
-    if eligible_for_rag:
-        run_rag_grading(assignment, eligible_for_rag)
-    else:
+    if not eligible_ids:
         logger.warning("[RAG SKIPPED] No eligible submissions")
+        return finalize_assignment_evaluation([], str(assignment.id), lease_token)
+
+    if not assignment.rag_collection:
+        raise RuntimeError("Assignment has no RAG collection")
+
+    _renew_lease(assignment_id, lease_token)
+
+    # Fan out chunks of submissions across the worker pool, then fan back
+    # in to finalise marks once every score is in. If a chunk or the
+    # finalisation fails for good, the errback frees the lease and queues
+    # the evaluation again, which resumes from the checkpoints.
+    chord(
+        score_submissions_with_rag.s(
+            str(assignment.id),
+            [str(submission_id) for submission_id in eligible_ids[start:start + RAG_CHUNK_SIZE]],
+            lease_token
+        )
+        for start in range(0, len(eligible_ids), RAG_CHUNK_SIZE)
+    )(
+        finalize_assignment_evaluation.s(str(assignment.id), lease_token).on_error(
+            evaluation_chord_failed.s(str(assignment.id), lease_token)
+        )
+    )
+
+    logger.info("[TASK END] RAG scoring dispatched")
+
+    return "Evaluation dispatched"
+
+
+def _renew_lease(assignment_id, lease_token):
+    # Stop before writing anything once another evaluation owns the
+    # assignment; LeaseLost is never retried
+    if not renew_evaluation_lease(assignment_id, lease_token):
+        logger.warning(f"[LEASE LOST] assignment_id={assignment_id}")
+        raise LeaseLost(assignment_id)
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(LeaseLost,),
+    retry_backoff=30,
+    retry_kwargs={'max_retries': 3}
+)
+def score_submissions_with_rag(self, assignment_id, submission_ids, lease_token=None):
+    _renew_lease(assignment_id, lease_token)
+
+    assignment = Assignment.objects.get(id=assignment_id)
+    submissions = with_extracted_text(StudentAssignment.objects.filter(
+        id__in=submission_ids,
+        evaluation_stage="plagiarism_done"
+    ))
+
+    run_rag_grading(assignment, submissions)
+
+    return len(submission_ids)
+
+
+@shared_task
+def evaluation_chord_failed(request, exc, traceback, assignment_id, lease_token=None):
+    """
+    Errback of the RAG chord: free the lease and run the evaluation again
+    from its checkpoints, up to EVALUATION_MAX_REQUEUES times. A chord that
+    lost its lease is handed back to the lease instead.
+    """
+    if isinstance(exc, LeaseLost):
+        return _requeue_after_lease_lost(assignment_id)
+
+    logger.error(f"[EVALUATION FAILED] assignment_id={assignment_id} | {exc}")
+
+    release_evaluation_lease(assignment_id, lease_token)
+
+    assignment = Assignment.objects.get(id=assignment_id)
+    report = assignment.evaluation_report or {}
+    requeues = report.get("requeues", 0)
+
+    if requeues >= EVALUATION_MAX_REQUEUES:
+        logger.error(
+            f"[EVALUATION ABANDONED] Gave up after {requeues} re-queues | "
+            f"assignment_id={assignment_id}"
+        )
+        return "Evaluation abandoned"
+
+    report["requeues"] = requeues + 1
+    Assignment.objects.filter(id=assignment.id).update(evaluation_report=report)
+
+    evaluate_assignment_after_deadline.apply_async(
+        args=[assignment_id],
+        countdown=EVALUATION_REQUEUE_COUNTDOWN * 2 ** requeues
+    )
+
+    return "Evaluation re-queued"
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(LeaseLost,),
+    retry_backoff=30,
+    retry_kwargs={'max_retries': 3}
+)
+def finalize_assignment_evaluation(self, results, assignment_id, lease_token=None):
+    _renew_lease(assignment_id, lease_token)
+
+    assignment = Assignment.objects.get(id=assignment_id)
 
     finalize_marks(assignment)
 
     assignment.status = "GRADED"
-    assignment.save(update_fields=["status"])
+    assignment.evaluation_report.pop("requeues", None)
+    assignment.save(update_fields=["status", "evaluation_report"])
+
+    release_evaluation_lease(assignment_id, lease_token)
 
-    logger.info("[TASK END] Evaluation complete")
+    logger.info(f"[TASK END] Evaluation complete | assignment_id={assignment_id}")
 
     return "Evaluation complete"
 
@@ -78,32 +340,176 @@ def evaluate_assignment_after_deadline(self, assignment_id):
     bind=True,
     autoretry_for=(Exception,),
     retry_backoff=20,
-    retry_kwargs={"max_retries": 3},
+    retry_kwargs={"max_retries": OCR_MAX_RETRIES},
 )
 
 def run_ocr_for_submission(self, submission_id):
     submission = StudentAssignment.objects.get(id=submission_id)
 
+    # Redelivered or duplicate task: OCR already done
+    if submission.ocr_status == "success" and submission.extracted_text is not None:
+        return "OCR already done"
+
     try:
-        file_path = submission.submitted_file.path
-        extracted_text, _ = extract_text_from_pdf_file(file_path)
+        fingerprint_submission(submission)
+
+        pages = get_cached_ocr(submission.content_sha256)
+        if pages is None:
+            file_path = submission.submitted_file.path
+            extracted_text, data = extract_text_from_pdf_file(file_path)
+            pages = data.get("pages") or [{"page_number": 1, "extracted_text": extracted_text}]
+            store_ocr_result(submission.content_sha256, pages)
+        else:
+            logger.info(f"[OCR CACHE HIT] submission={submission.id}")
 
-        submission.extracted_text = extracted_text
-        submission.ocr_status = "success"
-        submission.ocr_error = ""
-        submission.save(update_fields=[
-            "extracted_text",
-            "ocr_status",
-            "ocr_error"
-        ])
+        # A duplicate run (e.g. expedited by the OCR barrier) may have
+        # finished while this one was extracting; keep its result
+        with transaction.atomic():
+            locked = StudentAssignment.objects.select_for_update().get(id=submission.id)
+            if locked.ocr_status == "success":
+                return "OCR already done"
 
-        return "OCR success"
+            locked.ocr_status = "success"
+            locked.ocr_error = ""
+            save_submission_pages(locked, pages, fields=["ocr_status", "ocr_error"])
 
     except Exception as e:
-        submission.ocr_status = "failed"
-        submission.ocr_error = str(e)[:500]
-        submission.save(update_fields=[
-            "ocr_status",
-            "ocr_error"
-        ])
+        # "retrying" keeps the OCR barrier waiting while autoretry backs off.
+        # Never downgrade a submission another run has already OCR'd.
+        retrying = self.request.retries < OCR_MAX_RETRIES
+        downgraded = (
+            StudentAssignment.objects
+            .filter(id=submission.id)
+            .exclude(ocr_status="success")
+            .update(
+                ocr_status="retrying" if retrying else "failed",
+                ocr_error=str(e)[:500]
+            )
+        )
+        if not downgraded:
+            return "OCR already done"
         raise
+
+    # Compare against the assignment's index while the submission window is open
+    index_submission_for_plagiarism.delay(str(submission.id))
+
+    return "OCR success"
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=20,
+    retry_kwargs={"max_retries": 3},
+)
+def index_submission_for_plagiarism(self, submission_id):
+    submission = StudentAssignment.objects.get(id=submission_id)
+
+    if not submission.extracted_text:
+        return "No extracted text"
+
+    fingerprint = index_submission(submission)
+
+    return fingerprint.status
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=20,
+    retry_kwargs={"max_retries": 3},
+)
+def reocr_submission_page(self, submission_id, page_number):
+    """
+    OCR a single page again and splice it into extracted_text.
+    """
+    submission = StudentAssignment.objects.get(id=submission_id)
+
+    texts = extract_pages_from_pdf_file(submission.submitted_file.path, [page_number])
+    if page_number not in texts:
+        return f"No page {page_number}"
+
+    update_submission_page(submission.id, page_number, texts[page_number])
+    logger.info(f"[RE-OCR] submission={submission_id} page={page_number}")
+
+    # The text changed, so refresh its plagiarism fingerprint
+    index_submission_for_plagiarism.delay(str(submission.id))
+
+    return "Page re-OCR success"
+
+
+@shared_task(bind=True)
+def evict_stale_ocr_cache(self):
+    return evict_ocr_cache()
+
+
+@shared_task(bind=True)
+def evict_orphaned_resources(self):
+    """
+    Janitor: reclaim orphaned RAG collections and stale temp media.
+    """
+    return run_janitor()
+
+
+@shared_task(bind=True, max_retries=RAG_TRAINING_MAX_RETRIES)
+def train_rag_for_assignment(self, assignment_id):
+    """
+    Point the assignment at the RAG collection for its resource PDF,
+    training it unless another assignment's identical PDF already did, then
+    move it from TRAINING to ACTIVE and schedule its deadline evaluation.
+    After the last retry the assignment is marked FAILED.
+    """
+    assignment = Assignment.objects.get(id=assignment_id)
+
+    if assignment.rag_trained:
+        return "Already trained"
+
+    try:
+        collection_name = ensure_rag_collection(
+            file_sha256(assignment.resource_pdf),
+            assignment.resource_pdf.path
+        )
+        assignment.rag_collection = collection_name
+        assignment.save(update_fields=["rag_collection"])
+
+        # Scheduled before the assignment is marked trained, so a crash or
+        # error here leaves it TRAINING and the retry or redelivered task
+        # schedules again (scheduling is idempotent)
+        try:
+            schedule_assignment_evaluation(assignment)
+        except ValueError:
+            # Deadline passed while training
+            evaluate_assignment_after_deadline.delay(str(assignment.id))
+    except CollectionBusy as e:
+        # Another worker is training the same PDF; pick up its collection
+        logger.info(f"[RAG TRAINING WAIT] assignment_id={assignment_id} collection={e}")
+        train_rag_for_assignment.apply_async(
+            args=[assignment_id],
+            countdown=RAG_TRAINING_WAIT_INTERVAL
+        )
+        return "Waiting for shared collection"
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            logger.warning(f"[RAG TRAINING RETRY] assignment_id={assignment_id} | {e}")
+            raise self.retry(exc=e, countdown=30 * 2 ** self.request.retries)
+
+        logger.error(f"[RAG TRAINING FAILED] assignment_id={assignment_id} | {e}")
+        assignment.status = "FAILED"
+        assignment.rag_training_error = str(e)[:500]
+        assignment.save(update_fields=["status", "rag_training_error"])
+        return "RAG training failed"
+
+    assignment.rag_trained = True
+    assignment.rag_trained_at = timezone.now()
+    assignment.rag_training_error = None
+    assignment.status = "ACTIVE"
+    assignment.save(update_fields=[
+        "rag_trained",
+        "rag_trained_at",
+        "rag_training_error",
+        "status"
+    ])
+
+    logger.info(f"[RAG TRAINED] assignment_id={assignment_id} collection={collection_name}")
+
+    return "RAG training success"
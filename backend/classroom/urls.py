@@ -15,10 +15,15 @@ urlpatterns = [
     path('myJoinRequests/', StudentJoinRequestListView.as_view()),
     path('assignments/', AssignmentListCreateView.as_view()),
     path('assignments/<uuid:pk>/delete', AssignmentDeleteView.as_view()),
+    path('assignments/<uuid:pk>/finalize/', AssignmentFinalizeView.as_view()),
+    path('assignments/<uuid:pk>/status/', AssignmentStatusView.as_view()),
+    path('assignments/<uuid:pk>/retry-training/', AssignmentRetryTrainingView.as_view()),
     path('studentAssignments/', StudentAssignmentListView.as_view()),
     path('studentAssignmentsStatus/', StudentAssignmentsStatusView.as_view()),
     path('submitAssignment/', StudentAssignmentSubmitView.as_view()),
     path('class/<uuid:classroom_id>/submissions/', ClassroomSubmissionStatusView.as_view()),
+    path('submissions/<uuid:pk>/pages/', SubmissionPagesView.as_view()),
+    path('submissions/<uuid:pk>/pages/<int:page_number>/reocr/', SubmissionPageReocrView.as_view()),
     path("assignments/generate-questions/",GenerateAssignmentQuestionsView.as_view()),
     path("assignments/generated/create/",GeneratedAssignmentCreateView.as_view()
 )
@@ -17,10 +17,14 @@ def schedule_assignment_evaluation(assignment):
 
     task_name = f"evaluate_assignment_{assignment.id}"
 
-    PeriodicTask.objects.create(
-        clocked=clocked,
+    # Safe to call again, e.g. from a retried or redelivered training task
+    PeriodicTask.objects.update_or_create(
         name=task_name,
-        task="classroom.tasks.evaluate_assignment_after_deadline",
-        one_off=True,
-        args=json.dumps([str(assignment.id)]),
+        defaults={
+            "clocked": clocked,
+            "task": "classroom.tasks.evaluate_assignment_after_deadline",
+            "one_off": True,
+            "enabled": True,
+            "args": json.dumps([str(assignment.id)]),
+        }
     )
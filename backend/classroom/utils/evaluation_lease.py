@@ -0,0 +1,71 @@
+import uuid
+import redis
+from django.conf import settings
+from decouple import config
+
+# Seconds a lease survives without being renewed. Holders renew it as they
+# make progress, so a crashed evaluation frees the assignment after this long.
+EVALUATION_LEASE_TTL = config("EVALUATION_LEASE_TTL", default=3600, cast=int)
+
+# Only delete / extend the key if it still holds our token
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_client = None
+
+
+class LeaseLost(Exception):
+    """
+    The evaluation lease expired or was taken over by another evaluation.
+    """
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _client
+
+
+def _lease_key(assignment_id):
+    return f"classroom:evaluation-lease:{assignment_id}"
+
+
+def acquire_evaluation_lease(assignment_id, ttl=EVALUATION_LEASE_TTL):
+    """
+    Try to become the only evaluation running for this assignment.
+    Returns a token to renew / release the lease with, or None if another
+    evaluation holds it.
+    """
+    token = uuid.uuid4().hex
+    acquired = _redis().set(_lease_key(assignment_id), token, nx=True, ex=ttl)
+    return token if acquired else None
+
+
+def renew_evaluation_lease(assignment_id, token, ttl=EVALUATION_LEASE_TTL):
+    """
+    Push the lease expiry back. Returns False if the lease was lost.
+    """
+    if not token:
+        return False
+    return bool(_redis().eval(_RENEW_SCRIPT, 1, _lease_key(assignment_id), token, ttl))
+
+
+def release_evaluation_lease(assignment_id, token):
+    """
+    Release the lease if it is still ours.
+    """
+    if not token:
+        return False
+    return bool(_redis().eval(_RELEASE_SCRIPT, 1, _lease_key(assignment_id), token))
@@ -0,0 +1,167 @@
+"""
+Shared HTTP layer for the OCR, RAG and plagiarism service clients.
+
+Each upstream gets one keep-alive session per process (worker processes
+forked by Celery build their own), a bounded connection pool, jittered
+retries on idempotent calls and per-call latency accounting.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per upstream; callers beyond this wait for a free one
+HTTP_POOL_MAXSIZE = config("HTTP_POOL_MAXSIZE", default=16, cast=int)
+
+HTTP_CONNECT_TIMEOUT = config("HTTP_CONNECT_TIMEOUT", default=5, cast=float)
+
+# Retries on connection errors and 502/503/504, sleeping
+# backoff * 2 ** (retry - 1) plus up to `jitter` seconds between attempts.
+# Read timeouts are never retried: the upstream may still be working on the
+# request, and the caller's timeout is meant as a deadline
+HTTP_RETRY_TOTAL = config("HTTP_RETRY_TOTAL", default=3, cast=int)
+HTTP_RETRY_BACKOFF = config("HTTP_RETRY_BACKOFF", default=0.5, cast=float)
+HTTP_RETRY_JITTER = config("HTTP_RETRY_JITTER", default=0.5, cast=float)
+
+_RETRY_STATUSES = (502, 503, 504)
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+# Recent call durations kept per upstream for percentiles
+_LATENCY_WINDOW = 1000
+
+_lock = threading.Lock()
+_sessions = {}
+_latency = {}
+
+
+def get_session(upstream, retry_post=False):
+    """
+    This process's session for `upstream`. With retry_post=True, POSTs are
+    retried too; only use it for calls without side effects whose body can
+    be sent again.
+    """
+    key = (os.getpid(), upstream, retry_post)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            # Sessions inherited from a parent process share its sockets
+            for stale in [k for k in _sessions if k[0] != key[0]]:
+                del _sessions[stale]
+
+            session = _build_session(retry_post)
+            _sessions[key] = session
+    return session
+
+
+def _build_session(retry_post):
+    methods = _IDEMPOTENT_METHODS | {"POST"} if retry_post else _IDEMPOTENT_METHODS
+    retry = Retry(
+        total=HTTP_RETRY_TOTAL,
+        read=0,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        backoff_jitter=HTTP_RETRY_JITTER,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=methods,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request(upstream, method, url, timeout=60, retry_post=False, **kwargs):
+    """
+    Send a request to `upstream` through its pooled session. `timeout` is
+    the read timeout; HTTP_CONNECT_TIMEOUT applies to connecting.
+    """
+    if not isinstance(timeout, tuple):
+        timeout = (HTTP_CONNECT_TIMEOUT, timeout)
+
+    session = get_session(upstream, retry_post=retry_post)
+    started = time.perf_counter()
+    status = None
+    try:
+        resp = session.request(method, url, timeout=timeout, **kwargs)
+        status = resp.status_code
+        return resp
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(upstream, elapsed, status)
+        logger.debug(f"[HTTP] {upstream} {method} {url} status={status} {elapsed * 1000:.0f}ms")
+
+
+def get(upstream, url, **kwargs):
+    return request(upstream, "GET", url, **kwargs)
+
+
+def post(upstream, url, **kwargs):
+    return request(upstream, "POST", url, **kwargs)
+
+
+def delete(upstream, url, **kwargs):
+    return request(upstream, "DELETE", url, **kwargs)
+
+
+def _record(upstream, elapsed, status):
+    with _lock:
+        stats = _latency.get(upstream)
+        if stats is None:
+            stats = _latency[upstream] = {
+                "calls": 0,
+                "errors": 0,
+                "total_s": 0.0,
+                "recent": deque(maxlen=_LATENCY_WINDOW),
+            }
+        stats["calls"] += 1
+        stats["total_s"] += elapsed
+        stats["recent"].append(elapsed)
+        if status is None or status >= 400:
+            stats["errors"] += 1
+
+
+def latency_stats():
+    """
+    Per-upstream call count, error count, mean and p50/p99 over the last
+    calls made by this process.
+    """
+    with _lock:
+        snapshot = {
+            upstream: (stats["calls"], stats["errors"], stats["total_s"], sorted(stats["recent"]))
+            for upstream, stats in _latency.items()
+        }
+
+    report = {}
+    for upstream, (calls, errors, total, recent) in snapshot.items():
+        report[upstream] = {
+            "calls": calls,
+            "errors": errors,
+            "mean_s": round(total / calls, 4) if calls else None,
+            "p50_s": round(recent[int(0.5 * (len(recent) - 1))], 4) if recent else None,
+            "p99_s": round(recent[int(0.99 * (len(recent) - 1))], 4) if recent else None,
+        }
+    return report
+
+
+def reset_latency_stats():
+    with _lock:
+        _latency.clear()
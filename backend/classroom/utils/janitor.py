@@ -0,0 +1,254 @@
+"""
+Reclaims RAG collections and temporary media nothing refers to any more:
+expired question previews, collections of assignments removed by a
+classroom delete or a half-finished create, and files left in
+MEDIA_ROOT/temp. Deletions run in rate-limited batches so a large backlog
+doesn't flood the RAG service.
+"""
+import logging
+import os
+import time
+from datetime import timedelta
+
+from decouple import config
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.exceptions import HTTPError
+
+from classroom.models import Assignment, RagCollection, UnknownRagCollection
+from classroom.utils.rag_client import (
+    RAG_COLLECTION_PREFIX,
+    delete_rag_collection,
+    list_rag_collections,
+)
+from classroom.utils.rag_collections import RAG_TRAINING_CLAIM_TIMEOUT
+from classroom.utils.rag_score_cache import invalidate_rag_scores
+
+logger = logging.getLogger(__name__)
+
+# Deletions per batch, and seconds to pause between batches
+JANITOR_BATCH_SIZE = config("JANITOR_BATCH_SIZE", default=20, cast=int)
+JANITOR_BATCH_PAUSE = config("JANITOR_BATCH_PAUSE", default=1.0, cast=float)
+
+# Deletions per run for each kind of resource; the rest wait for the next run
+JANITOR_MAX_DELETIONS = config("JANITOR_MAX_DELETIONS", default=200, cast=int)
+
+# Unreferenced collections and temp files younger than this are left alone
+JANITOR_GRACE_MINUTES = config("JANITOR_GRACE_MINUTES", default=60, cast=int)
+
+# Also delete collections on the RAG service that carry this deployment's
+# RAG_COLLECTION_PREFIX but that the database doesn't know. Needs a prefix,
+# since other deployments may share the service
+JANITOR_REMOTE_SWEEP = config("JANITOR_REMOTE_SWEEP", default=False, cast=bool)
+
+
+def run_janitor():
+    """
+    Reconcile RAG collections and temp files against the database, delete
+    the orphans and return what was reclaimed.
+    """
+    started = time.perf_counter()
+    now = timezone.now()
+    cutoff = now - timedelta(minutes=JANITOR_GRACE_MINUTES)
+
+    report = {
+        "collections": _reclaim_collections(now, cutoff),
+        "temp_files": _reclaim_temp_files(cutoff),
+    }
+    report["seconds"] = round(time.perf_counter() - started, 2)
+
+    logger.info(f"[JANITOR] {report}")
+
+    return report
+
+
+def _rate_limited(items, delete):
+    """
+    Call delete(item) for up to JANITOR_MAX_DELETIONS items, pausing
+    JANITOR_BATCH_PAUSE seconds after every JANITOR_BATCH_SIZE. delete
+    returns a truthy value if it reclaimed something. Returns (results of
+    successful deletes, failed count, deferred count).
+    """
+    done = []
+    failed = 0
+    attempted = 0
+
+    for item in items:
+        if attempted >= JANITOR_MAX_DELETIONS:
+            break
+        if attempted and JANITOR_BATCH_SIZE > 0 and attempted % JANITOR_BATCH_SIZE == 0:
+            time.sleep(JANITOR_BATCH_PAUSE)
+        attempted += 1
+
+        try:
+            result = delete(item)
+        except Exception as e:
+            logger.warning(f"[JANITOR] Could not delete {item}: {e}")
+            failed += 1
+            continue
+        if result:
+            done.append(result)
+
+    return done, failed, max(0, len(items) - attempted)
+
+
+def _referenced_names():
+    return set(
+        Assignment.objects
+        .exclude(rag_collection__isnull=True)
+        .exclude(rag_collection="")
+        .values_list("rag_collection", flat=True)
+    )
+
+
+def _orphan_rows(now, cutoff):
+    """
+    RagCollection rows no assignment uses: expired previews, and other
+    rows not claimed within the grace period. Rows being trained are
+    skipped.
+    """
+    return (
+        RagCollection.objects
+        .filter(
+            Q(expires_at__lt=now) |
+            Q(expires_at__isnull=True, last_claimed_at__lt=cutoff)
+        )
+        .exclude(status="training", training_started_at__gte=now - RAG_TRAINING_CLAIM_TIMEOUT)
+    )
+
+
+def _reclaim_collections(now, cutoff):
+    referenced = _referenced_names()
+
+    orphan_ids = {
+        name: collection_id
+        for collection_id, name in _orphan_rows(now, cutoff).values_list("id", "name")
+        if name not in referenced
+    }
+
+    remote_sweep = _sweep_remote_collections(cutoff, referenced)
+    for name in remote_sweep["orphans"]:
+        orphan_ids.setdefault(name, None)
+
+    def delete_remote(name):
+        try:
+            delete_rag_collection(name)
+        except HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+
+    def delete(name):
+        collection_id = orphan_ids[name]
+        if collection_id is None:
+            # Re-check: a preview or training may have claimed the name
+            if (
+                RagCollection.objects.filter(name=name).exists() or
+                Assignment.objects.filter(rag_collection=name).exists()
+            ):
+                UnknownRagCollection.objects.filter(name=name).delete()
+                return None
+            delete_remote(name)
+            UnknownRagCollection.objects.filter(name=name).delete()
+        else:
+            # Lock the row while deleting so a concurrent claim in
+            # ensure_rag_collection waits and then trains afresh, and skip
+            # it if it was claimed since the scan
+            with transaction.atomic():
+                row = (
+                    _orphan_rows(now, cutoff)
+                    .select_for_update()
+                    .filter(id=collection_id)
+                    .first()
+                )
+                if row is None or Assignment.objects.filter(rag_collection=name).exists():
+                    return None
+                delete_remote(name)
+                row.delete()
+
+        invalidate_rag_scores(name)
+        return name
+
+    reclaimed, failed, deferred = _rate_limited(sorted(orphan_ids), delete)
+
+    return {
+        "reclaimed": len(reclaimed),
+        "names": reclaimed,
+        "failed": failed,
+        "deferred": deferred,
+        "remote_sweep": remote_sweep["status"],
+        "remote_unknown": remote_sweep["unknown"],
+    }
+
+
+def _sweep_remote_collections(cutoff, referenced):
+    """
+    Remote collections with this deployment's prefix that the database
+    doesn't know. A name is only an orphan once it was already unknown on
+    a run before `cutoff`; until then its first sighting is recorded.
+    """
+    result = {"status": "disabled", "unknown": 0, "orphans": []}
+
+    if not JANITOR_REMOTE_SWEEP:
+        return result
+    if not RAG_COLLECTION_PREFIX:
+        logger.warning("[JANITOR] Remote sweep needs RAG_COLLECTION_PREFIX; skipped")
+        result["status"] = "no_prefix"
+        return result
+
+    remote_names = list_rag_collections()
+    if remote_names is None:
+        result["status"] = "no_listing"
+        return result
+
+    known = set(RagCollection.objects.values_list("name", flat=True)) | referenced
+    unknown = {
+        name for name in remote_names
+        if name.startswith(RAG_COLLECTION_PREFIX) and name not in known
+    }
+
+    # Forget names that are known again or gone from the service
+    UnknownRagCollection.objects.exclude(name__in=unknown).delete()
+    seen = dict(
+        UnknownRagCollection.objects
+        .filter(name__in=unknown)
+        .values_list("name", "first_seen_at")
+    )
+    UnknownRagCollection.objects.bulk_create(
+        [UnknownRagCollection(name=name) for name in unknown if name not in seen],
+        ignore_conflicts=True
+    )
+
+    result["status"] = "ok"
+    result["unknown"] = len(unknown)
+    result["orphans"] = sorted(
+        name for name, first_seen_at in seen.items() if first_seen_at < cutoff
+    )
+    return result
+
+
+def _reclaim_temp_files(cutoff):
+    temp_dir = os.path.join(settings.MEDIA_ROOT, "temp")
+    threshold = cutoff.timestamp()
+
+    stale = []
+    if os.path.isdir(temp_dir):
+        with os.scandir(temp_dir) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False) and entry.stat().st_mtime < threshold:
+                    stale.append(entry.path)
+
+    def delete(path):
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+
+    sizes, failed, deferred = _rate_limited(stale, delete)
+
+    return {
+        "reclaimed": len(sizes),
+        "bytes": sum(sizes),
+        "failed": failed,
+        "deferred": deferred,
+    }
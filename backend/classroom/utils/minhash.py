@@ -0,0 +1,182 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# 32 bands of 4 rows: pairs above ~0.42 Jaccard similarity share a bucket
+# with high probability, pairs far below it almost never do
+NUM_PERM = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Similarity at or above which a submission is flagged
+SUSPICIOUS_SIMILARITY = 0.5
+PLAGIARIZED_SIMILARITY = 0.8
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures are stored, so the permutations must never change
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def shingle_hashes(text):
+    """
+    32-bit hashes of the text's lower-cased word shingles.
+    """
+    words = _WORD_RE.findall((text or "").lower())
+    if not words:
+        return set()
+
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {
+            " ".join(words[i:i + SHINGLE_SIZE])
+            for i in range(len(words) - SHINGLE_SIZE + 1)
+        }
+
+    return {
+        int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "big")
+        for s in shingles
+    }
+
+
+def minhash_signature(text):
+    """
+    NUM_PERM-long MinHash signature of the text, or [] for empty text.
+    """
+    hashes = shingle_hashes(text)
+    if not hashes:
+        return []
+
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def signature_similarity(signature_a, signature_b):
+    """
+    Jaccard similarity estimate: the fraction of matching MinHash slots.
+    """
+    if not signature_a or not signature_b:
+        return 0.0
+
+    matches = sum(1 for x, y in zip(signature_a, signature_b) if x == y)
+    return matches / NUM_PERM
+
+
+def lsh_band_keys(signature):
+    """
+    One bucket key per LSH band. Two signatures sharing any key are
+    candidate near-duplicates.
+    """
+    if not signature:
+        return []
+
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(
+            ",".join(map(str, rows)).encode(), digest_size=8
+        ).hexdigest()
+        keys.append(f"{band:02d}:{digest}")
+    return keys
+
+
+def similarity_status(similarity):
+    """
+    Map a similarity to (status, penalty) in the plagiarism service's terms,
+    where the penalty is 0.0 for original work and 1.0 for a copy.
+    """
+    if similarity >= PLAGIARIZED_SIMILARITY:
+        return "plagiarized", 1.0
+    if similarity >= SUSPICIOUS_SIMILARITY:
+        return "suspicious", round(similarity, 4)
+    return "original", 0.0
+
+
+def find_candidate_pairs(signatures):
+    """
+    Bucket every signature by LSH band and return the set of key pairs that
+    share at least one bucket. Runs in time linear in the number of
+    signatures plus the number of colliding pairs.
+    """
+    buckets = defaultdict(list)
+    for key, signature in signatures.items():
+        for band_key in lsh_band_keys(signature):
+            buckets[band_key].append(key)
+
+    pairs = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i in range(len(members)):
+            for j in range(i + 1, len(members)):
+                a, b = members[i], members[j]
+                pairs.add((a, b) if a < b else (b, a))
+    return pairs
+
+
+def candidate_clusters(pairs):
+    """
+    Group candidate pairs into connected clusters (lists of keys).
+    """
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    clusters = defaultdict(list)
+    for key in parent:
+        clusters[find(key)].append(key)
+    return list(clusters.values())
+
+
+def run_local_plagiarism_check(assignment_id, signatures):
+    """
+    In-process plagiarism engine. `signatures` maps submission id to its
+    MinHash signature. Returns a response shaped like the plagiarism
+    service's.
+    """
+    best = {submission_id: 0.0 for submission_id in signatures}
+    for a, b in find_candidate_pairs(signatures):
+        similarity = signature_similarity(signatures[a], signatures[b])
+        best[a] = max(best[a], similarity)
+        best[b] = max(best[b], similarity)
+
+    results = []
+    for submission_id, similarity in best.items():
+        status, penalty = similarity_status(similarity)
+        results.append({
+            "assignment_id": submission_id,
+            "plagiarism_score": penalty,
+            "max_similarity": round(similarity, 4),
+            "status": status
+        })
+
+    return {
+        "success": True,
+        "assignment_group_id": str(assignment_id),
+        "engine": "local-minhash",
+        "results": results
+    }
@@ -0,0 +1,141 @@
+import hashlib
+import logging
+from datetime import timedelta
+
+from decouple import config
+from django.db.models import F
+from django.utils import timezone
+
+from classroom.models import OcrCacheEntry, StudentAssignment
+
+logger = logging.getLogger(__name__)
+
+# Entries not used for this long are evicted
+OCR_CACHE_TTL_DAYS = config("OCR_CACHE_TTL_DAYS", default=30, cast=int)
+
+# Beyond this many entries the least recently used ones are evicted
+OCR_CACHE_MAX_ENTRIES = config("OCR_CACHE_MAX_ENTRIES", default=5000, cast=int)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(field_file):
+    """
+    Hex SHA-256 of a stored file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    field_file.open("rb")
+    try:
+        for chunk in field_file.chunks(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def fingerprint_submission(submission):
+    """
+    Store the submitted file's SHA-256 and, if another submission of the
+    same assignment has identical bytes, point exact_copy_of at the
+    earliest one.
+    """
+    if not submission.submitted_file:
+        return submission
+
+    fields = []
+
+    if not submission.content_sha256:
+        submission.content_sha256 = file_sha256(submission.submitted_file)
+        fields.append("content_sha256")
+
+    # The earliest upload of the content is the original, the rest copies
+    original = (
+        StudentAssignment.objects
+        .filter(
+            assignment_id=submission.assignment_id,
+            content_sha256=submission.content_sha256
+        )
+        .order_by(F("submitted_at").asc(nulls_last=True), "id")
+        .only("id")
+        .first()
+    )
+
+    if original and original.id != submission.id:
+        if submission.exact_copy_of_id != original.id:
+            submission.exact_copy_of_id = original.id
+            fields.append("exact_copy_of")
+            logger.warning(
+                f"[EXACT COPY] submission={submission.id} "
+                f"matches submission={original.id}"
+            )
+
+    if fields:
+        submission.save(update_fields=fields)
+
+    return submission
+
+
+def get_cached_ocr(content_sha256):
+    """
+    Cached pages ([{"page_number", "extracted_text", "source"}, ...]) for
+    the hash, or None. Marks the entry as used.
+    """
+    if not content_sha256:
+        return None
+
+    entry = (
+        OcrCacheEntry.objects
+        .filter(content_sha256=content_sha256)
+        .only("id", "data")
+        .first()
+    )
+    if entry is None:
+        return None
+
+    OcrCacheEntry.objects.filter(id=entry.id).update(
+        hits=F("hits") + 1,
+        last_used_at=timezone.now()
+    )
+    return entry.pages
+
+
+def store_ocr_result(content_sha256, pages):
+    if not content_sha256:
+        return
+
+    # A concurrent worker may have cached the same file already
+    OcrCacheEntry.objects.bulk_create(
+        [
+            OcrCacheEntry(
+                content_sha256=content_sha256,
+                data=OcrCacheEntry.compress(pages),
+                page_count=len(pages)
+            )
+        ],
+        ignore_conflicts=True
+    )
+
+
+def evict_ocr_cache(ttl_days=None, max_entries=None):
+    """
+    Delete entries unused for ttl_days, then the least recently used ones
+    beyond max_entries. Returns the number of entries deleted per rule.
+    """
+    ttl_days = OCR_CACHE_TTL_DAYS if ttl_days is None else ttl_days
+    max_entries = OCR_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+
+    cutoff = timezone.now() - timedelta(days=ttl_days)
+    expired, _ = OcrCacheEntry.objects.filter(last_used_at__lt=cutoff).delete()
+
+    overflow = 0
+    excess_ids = list(
+        OcrCacheEntry.objects
+        .order_by("-last_used_at")
+        .values_list("id", flat=True)[max_entries:]
+    )
+    if excess_ids:
+        overflow, _ = OcrCacheEntry.objects.filter(id__in=excess_ids).delete()
+
+    logger.info(f"[OCR CACHE] Evicted expired={expired} overflow={overflow}")
+
+    return {"expired": expired, "overflow": overflow}
@@ -1,19 +1,210 @@
-import requests
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from requests.exceptions import RequestException
 from decouple import config
+from pypdf import PdfReader, PdfWriter
+
+from classroom.utils import http_client
+
+logger = logging.getLogger(__name__)
+
 OCR_PATH = config("OCR_PATH")
 OCR_URL = f"{OCR_PATH}/pdf"
 
+# Read the PDF's embedded text layer first and OCR only the pages without one
+OCR_TEXT_LAYER = config("OCR_TEXT_LAYER", default=True, cast=bool)
+
+# Pages with fewer visible characters than this are treated as scanned
+OCR_MIN_PAGE_CHARS = config("OCR_MIN_PAGE_CHARS", default=25, cast=int)
+
+# Split pages that need OCR into ranges of this many pages and OCR the
+# ranges concurrently (0 sends them in one request)
+OCR_PAGE_RANGE_SIZE = config("OCR_PAGE_RANGE_SIZE", default=0, cast=int)
+
+# Page ranges in flight at once per submission
+OCR_PAGE_RANGE_WORKERS = config("OCR_PAGE_RANGE_WORKERS", default=4, cast=int)
+
+# Extra attempts for page ranges whose OCR request failed
+OCR_PAGE_RANGE_RETRIES = config("OCR_PAGE_RANGE_RETRIES", default=2, cast=int)
+
+
 def extract_text_from_pdf_file(file_path, timeout=60):
-    try:
+    reader = None
+    if OCR_TEXT_LAYER or OCR_PAGE_RANGE_SIZE > 0:
+        reader = _open_pdf(file_path)
+
+    if reader is None:
         with open(file_path, "rb") as fp:
-            files = {"file": (file_path, fp, "application/pdf")}
-            resp = requests.post(OCR_URL, files=files, timeout=timeout)
-            resp.raise_for_status()
-            data = resp.json()
-    except RequestException as e:
-        raise
+            data = _post_pdf(file_path, fp, timeout)
+    else:
+        if OCR_TEXT_LAYER:
+            layer_texts = _read_text_layer(reader)
+        else:
+            layer_texts = [None] * len(reader.pages)
+        data = _merge_with_ocr(reader, layer_texts, file_path, timeout)
 
     pages = data.get("pages", [])
     extracted_text = "\n\n".join([p.get("extracted_text", "") for p in pages])
     return extracted_text, data
+
+
+def extract_pages_from_pdf_file(file_path, page_numbers, timeout=60):
+    """
+    OCR only the given 1-based pages, ignoring any text layer. Returns
+    {page_number: text}.
+    """
+    reader = _open_pdf(file_path)
+    if reader is None:
+        raise RuntimeError(f"Could not read {file_path} as a PDF")
+
+    indexes = sorted({n - 1 for n in page_numbers if 0 < n <= len(reader.pages)})
+    if not indexes:
+        return {}
+
+    texts = _ocr_pages(reader, indexes, file_path, timeout)
+    return {i + 1: text for i, text in texts.items()}
+
+
+def _post_pdf(file_name, fp, timeout):
+    try:
+        files = {"file": (file_name, fp, "application/pdf")}
+        resp = http_client.post("ocr", OCR_URL, files=files, timeout=timeout, retry_post=True)
+        resp.raise_for_status()
+        return resp.json()
+    except RequestException as e:
+        raise
+
+
+def _open_pdf(file_path):
+    """
+    PdfReader for the file, or None if it can't be parsed locally, in which
+    case the whole file goes to OCR.
+    """
+    try:
+        reader = PdfReader(file_path)
+        len(reader.pages)
+        return reader
+    except Exception as e:
+        logger.warning(f"[OCR] Could not parse {file_path} locally: {e}")
+        return None
+
+
+def _read_text_layer(reader):
+    """
+    texts[i] is page i's embedded text, or None if the page has no usable
+    text layer.
+    """
+    texts = []
+    for page in reader.pages:
+        try:
+            text = (page.extract_text() or "").strip()
+        except Exception:
+            text = ""
+        visible = sum(1 for c in text if c.isprintable() and not c.isspace())
+        texts.append(text if visible >= OCR_MIN_PAGE_CHARS else None)
+    return texts
+
+
+def _merge_with_ocr(reader, layer_texts, file_path, timeout):
+    scanned = [i for i, text in enumerate(layer_texts) if text is None]
+
+    if OCR_TEXT_LAYER:
+        logger.info(
+            f"[OCR TEXT LAYER] {file_path}: {len(layer_texts) - len(scanned)} pages "
+            f"with text, {len(scanned)} sent to OCR"
+        )
+
+    ocr_texts = {}
+    if scanned:
+        if OCR_PAGE_RANGE_SIZE > 0 and len(scanned) > OCR_PAGE_RANGE_SIZE:
+            ocr_texts = _ocr_page_ranges(reader, scanned, file_path, timeout)
+        else:
+            ocr_texts = _ocr_pages(reader, scanned, file_path, timeout)
+
+    pages = []
+    for i, text in enumerate(layer_texts):
+        pages.append({
+            "page_number": i + 1,
+            "extracted_text": text if text is not None else ocr_texts.get(i, ""),
+            "source": "text_layer" if text is not None else "ocr"
+        })
+
+    return {"pages": pages}
+
+
+def _subset_pdf(reader, page_indexes):
+    writer = PdfWriter()
+    for i in page_indexes:
+        writer.add_page(reader.pages[i])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _ocr_subset(page_indexes, pdf_bytes, file_path, timeout):
+    """
+    OCR a PDF made of the given pages; returns {page index: text}.
+    """
+    ocr_pages = _post_pdf(file_path, io.BytesIO(pdf_bytes), timeout).get("pages", [])
+
+    # The OCR service returns the subset's pages in order
+    return {
+        i: page.get("extracted_text", "")
+        for i, page in zip(page_indexes, ocr_pages)
+    }
+
+
+def _ocr_pages(reader, page_indexes, file_path, timeout):
+    return _ocr_subset(page_indexes, _subset_pdf(reader, page_indexes), file_path, timeout)
+
+
+def _ocr_page_ranges(reader, page_indexes, file_path, timeout):
+    """
+    OCR the pages in OCR_PAGE_RANGE_SIZE ranges, OCR_PAGE_RANGE_WORKERS at a
+    time. Failed ranges are retried on their own; any range still failing
+    after OCR_PAGE_RANGE_RETRIES extra attempts raises.
+    """
+    # Split up front: the reader is not safe to share between threads
+    ranges = [
+        (pages, _subset_pdf(reader, pages))
+        for pages in (
+            page_indexes[start:start + OCR_PAGE_RANGE_SIZE]
+            for start in range(0, len(page_indexes), OCR_PAGE_RANGE_SIZE)
+        )
+    ]
+
+    logger.info(f"[OCR RANGES] {file_path}: {len(page_indexes)} pages in {len(ranges)} ranges")
+
+    texts = {}
+    pending = ranges
+    errors = []
+
+    for attempt in range(OCR_PAGE_RANGE_RETRIES + 1):
+        if attempt:
+            time.sleep(2 ** (attempt - 1))
+            logger.warning(f"[OCR RANGES] Retrying {len(pending)} ranges of {file_path}")
+
+        with ThreadPoolExecutor(max_workers=max(1, OCR_PAGE_RANGE_WORKERS)) as executor:
+            futures = [
+                (item, executor.submit(_ocr_subset, item[0], item[1], file_path, timeout))
+                for item in pending
+            ]
+
+        failed = []
+        errors = []
+        for item, future in futures:
+            try:
+                texts.update(future.result())
+            except Exception as e:
+                failed.append(item)
+                errors.append(e)
+
+        pending = failed
+        if not pending:
+            return texts
+
+    failed_ranges = ", ".join(f"{pages[0] + 1}-{pages[-1] + 1}" for pages, _ in pending)
+    raise RuntimeError(f"OCR failed for pages {failed_ranges}: {errors[0]}")
@@ -1,33 +1,96 @@
-import requests
 from requests.exceptions import RequestException
 from decouple import config
 import logging
 import json
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from classroom.utils import http_client
+from classroom.utils.submission_text import with_extracted_text
 
 logger = logging.getLogger(__name__)
 PLAG_PATH = config("PLAG_PATH")  # e.g. 
 CHECK_URL = f"{PLAG_PATH}/plagiarism/check"
 
+# Send the check as a gzip-compressed, chunked JSON stream built straight
+# from the database. Requires the plagiarism service to accept
+# "Content-Encoding: gzip" request bodies.
+PLAG_STREAM_REQUESTS = config("PLAG_STREAM_REQUESTS", default=False, cast=bool)
+
+# Rows fetched per round trip while streaming; peak memory is roughly two
+# chunks of extracted text, whatever the cohort size
+PLAG_STREAM_CHUNK_SIZE = config("PLAG_STREAM_CHUNK_SIZE", default=20, cast=int)
+
+# Cohorts larger than twice this are split into blocks of this many
+# submissions: each block is checked on its own, and each pair of blocks in
+# a request of at most 2 x PLAG_SHARD_BLOCK_SIZE (0 disables sharding)
+PLAG_SHARD_BLOCK_SIZE = config("PLAG_SHARD_BLOCK_SIZE", default=250, cast=int)
+
+# Shard checks in flight at once. Only their payloads are in memory, so peak
+# memory is about PLAG_SHARD_WORKERS x 2 x PLAG_SHARD_BLOCK_SIZE texts
+PLAG_SHARD_WORKERS = config("PLAG_SHARD_WORKERS", default=4, cast=int)
+
 def run_plagiarism_check(
     assignment_id: str,
     submissions: list,
-    timeout: int = 120
+    timeout: int = 120,
+    pair_scope: str = None
 ):
+    """
+    With pair_scope="cross", the service only needs to compare submissions
+    whose "shard_group" differs (see run_sharded_plagiarism_check).
+    """
     payload = {
         "assignment_group_id": str(assignment_id),
         "assignments": submissions
     }
+    if pair_scope:
+        payload["pair_scope"] = pair_scope
 
-    # Log ACTUAL JSON, not Python repr
     logger.info(
-        "Plagiarism Check Payload:\n%s",
-        json.dumps(payload, indent=2, ensure_ascii=False)
+        f"Plagiarism check | assignment_group_id={assignment_id} "
+        f"submissions={len(submissions)}"
     )
 
     try:
-        resp = requests.post(
+        resp = http_client.post(
+            "plagiarism",
             CHECK_URL,
-            json=payload,   # ← THIS WAS ALWAYS CORRECT
+            json=payload,
+            timeout=timeout,
+            retry_post=True
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    except RequestException as e:
+        raise RuntimeError(f"Plagiarism check failed: {str(e)}")
+
+
+def run_plagiarism_check_streamed(
+    assignment_id: str,
+    submissions,
+    timeout: int = 120,
+    pair_scope: str = None
+):
+    """
+    Same contract as run_plagiarism_check, but `submissions` may be any
+    iterable (e.g. iter_plagiarism_payload) and the body is gzip-compressed
+    and sent chunked as it is produced, so memory stays bounded by one
+    chunk of rows instead of the whole cohort.
+    """
+    logger.info(f"Plagiarism check (streamed) | assignment_group_id={assignment_id}")
+
+    try:
+        # A generator body can't be replayed, so this call is not retried
+        resp = http_client.post(
+            "plagiarism",
+            CHECK_URL,
+            data=_gzip_json_stream(assignment_id, submissions, pair_scope),
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip"
+            },
             timeout=timeout
         )
         resp.raise_for_status()
@@ -37,19 +100,178 @@ def run_plagiarism_check(
         raise RuntimeError(f"Plagiarism check failed: {str(e)}")
 
 
+def run_sharded_plagiarism_check(
+    assignment_id: str,
+    student_assignments,
+    block_size: int = PLAG_SHARD_BLOCK_SIZE,
+    max_workers: int = PLAG_SHARD_WORKERS,
+    timeout: int = 120,
+    stream: bool = PLAG_STREAM_REQUESTS
+):
+    """
+    Check a large cohort (a StudentAssignment queryset) in blocks of
+    `block_size`: one request per block for the pairs inside it, and one
+    per pair of blocks for the pairs across them. Cross-block requests carry
+    pair_scope="cross" and a "shard_group" per submission so the service can
+    skip the within-block pairs it has already compared; a service that
+    ignores them still returns correct results.
+
+    Payloads are read from the database one job at a time, and at most
+    `max_workers` jobs are held in memory. Returns the merged results in
+    run_plagiarism_check's shape.
+    """
+    ids = list(student_assignments.values_list("id", flat=True))
+    blocks = [ids[start:start + block_size] for start in range(0, len(ids), block_size)]
+
+    jobs = [(i, None) for i in range(len(blocks))] + [
+        (i, j)
+        for i in range(len(blocks))
+        for j in range(i + 1, len(blocks))
+    ]
+
+    logger.info(
+        f"Plagiarism check sharded | assignment_group_id={assignment_id} "
+        f"submissions={len(ids)} blocks={len(blocks)} jobs={len(jobs)}"
+    )
+
+    def build(job):
+        items = []
+        for group, block in enumerate(b for b in job if b is not None):
+            for item in iter_plagiarism_payload(student_assignments.filter(id__in=blocks[block])):
+                if job[1] is not None:
+                    item["shard_group"] = group
+                items.append(item)
+        return items
+
+    def send(job, items):
+        pair_scope = "cross" if job[1] is not None else None
+        if stream:
+            return run_plagiarism_check_streamed(
+                assignment_id, iter(items), timeout=timeout, pair_scope=pair_scope
+            )
+        return run_plagiarism_check(assignment_id, items, timeout=timeout, pair_scope=pair_scope)
+
+    responses = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        in_flight = set()
+        for job in jobs:
+            if len(in_flight) >= max(1, max_workers):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                responses.extend(future.result() for future in done)
+            # Built here, not in the worker, so the database is only read
+            # from the calling thread
+            in_flight.add(executor.submit(send, job, build(job)))
+
+        responses.extend(future.result() for future in wait(in_flight).done)
+
+    return merge_plagiarism_responses(responses)
+
+
+def merge_plagiarism_responses(responses):
+    """
+    Combine partial check responses: each submission keeps its highest
+    plagiarism_score (penalty) and max_similarity, and the status of the
+    partial result with the highest penalty.
+    """
+    merged = {}
+
+    for response in responses:
+        if not response.get("success"):
+            return response
+
+        for result in response.get("results", []):
+            submission_id = result.get("assignment_id")
+            if not submission_id:
+                continue
+
+            current = merged.get(submission_id)
+            if current is None:
+                merged[submission_id] = dict(result)
+                continue
+
+            penalty = result.get("plagiarism_score") or 0.0
+            similarity = result.get("max_similarity") or 0.0
+
+            if (penalty, similarity) > (
+                current.get("plagiarism_score") or 0.0,
+                current.get("max_similarity") or 0.0
+            ):
+                current["plagiarism_score"] = penalty
+                current["status"] = result.get("status")
+
+            current["max_similarity"] = max(
+                current.get("max_similarity") or 0.0,
+                similarity
+            )
+
+    return {"success": True, "results": list(merged.values())}
+
+
+def _gzip_json_stream(assignment_id, submissions, pair_scope=None):
+    # wbits=31 selects the gzip container
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    count = 0
+    raw_bytes = 0
+
+    scope = f', "pair_scope": {json.dumps(pair_scope)}' if pair_scope else ""
+    head = (
+        '{"assignment_group_id": ' + json.dumps(str(assignment_id)) + scope +
+        ', "assignments": ['
+    ).encode()
+    raw_bytes += len(head)
+    chunk = compressor.compress(head)
+    if chunk:
+        yield chunk
+
+    for submission in submissions:
+        item = json.dumps(submission, ensure_ascii=False).encode()
+        if count:
+            item = b"," + item
+        count += 1
+        raw_bytes += len(item)
+
+        chunk = compressor.compress(item)
+        if chunk:
+            yield chunk
+
+    yield compressor.compress(b"]}") + compressor.flush()
+
+    logger.info(f"Plagiarism payload streamed: {count} submissions, {raw_bytes} bytes uncompressed")
+
+
+def _submission_payload(sub):
+    return {
+        "assignment_id": str(sub.id),
+        "extracted_text": sub.extracted_text,
+        "student_id": str(sub.student_id),
+        "submitted_at": sub.submitted_at.isoformat()
+    }
+
+
 def build_plagiarism_payload(assignment, student_assignments):
 
     submissions = []
 
-    for sub in student_assignments:
+    for sub in with_extracted_text(student_assignments):
         if not sub.extracted_text:
             continue  # skip OCR failures
 
-        submissions.append({
-            "assignment_id": str(sub.id),
-            "extracted_text": sub.extracted_text,
-            "student_id": str(sub.student.id),
-            "submitted_at": sub.submitted_at.isoformat()
-        })   
+        submissions.append(_submission_payload(sub))
 
     return submissions
+
+
+def iter_plagiarism_payload(student_assignments):
+    """
+    Lazily yield payload items from a StudentAssignment queryset, fetching
+    PLAG_STREAM_CHUNK_SIZE rows at a time.
+    """
+    rows = with_extracted_text(
+        student_assignments, "id", "student_id", "submitted_at"
+    ).iterator(chunk_size=PLAG_STREAM_CHUNK_SIZE)
+
+    for sub in rows:
+        if not sub.extracted_text:
+            continue  # skip OCR failures
+
+        yield _submission_payload(sub)
@@ -0,0 +1,164 @@
+import logging
+from django.db import transaction
+from classroom.models import Assignment, PlagiarismFingerprint, PlagiarismBand
+from classroom.utils.minhash import (
+    minhash_signature,
+    lsh_band_keys,
+    signature_similarity,
+    similarity_status,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def index_submission(submission):
+    """
+    MinHash a submission and compare it against the submissions of the same
+    assignment that share an LSH bucket with it, updating the provisional
+    max similarity on both sides of each candidate pair. When the
+    submission is indexed again (e.g. after a page is re-OCR'd), submissions
+    whose max came from its old text are recomputed.
+    """
+    signature = minhash_signature(submission.extracted_text)
+    band_keys = lsh_band_keys(signature)
+
+    with transaction.atomic():
+        # Serialise index writers per assignment so two submissions finishing
+        # OCR together always see each other
+        Assignment.objects.select_for_update().only("id").get(id=submission.assignment_id)
+
+        fingerprint, _ = PlagiarismFingerprint.objects.get_or_create(
+            submission_id=submission.id,
+            defaults={"assignment_id": submission.assignment_id}
+        )
+        # Their max may have come from this submission's previous signature
+        stale_ids = set(
+            PlagiarismFingerprint.objects
+            .filter(assignment_id=submission.assignment_id, matched_submission_id=submission.id)
+            .exclude(id=fingerprint.id)
+            .values_list("id", flat=True)
+        )
+
+        fingerprint.signature = signature
+        fingerprint.max_similarity = 0.0
+        fingerprint.matched_submission_id = None
+
+        fingerprint.bands.all().delete()
+        PlagiarismBand.objects.bulk_create([
+            PlagiarismBand(
+                fingerprint=fingerprint,
+                assignment_id=submission.assignment_id,
+                key=key
+            )
+            for key in band_keys
+        ])
+
+        candidates = _bucket_neighbours(fingerprint, band_keys)
+
+        changed = []
+        for other in candidates:
+            similarity = signature_similarity(signature, other.signature)
+
+            if similarity > fingerprint.max_similarity:
+                fingerprint.max_similarity = similarity
+                fingerprint.matched_submission_id = other.submission_id
+
+            if similarity > other.max_similarity:
+                other.max_similarity = similarity
+                other.matched_submission_id = submission.id
+                other.status = similarity_status(similarity)[0]
+                changed.append(other)
+
+        fingerprint.status = similarity_status(fingerprint.max_similarity)[0]
+        fingerprint.save()
+
+        # A neighbour whose max went up above is already right; the rest may
+        # have lost their match to the old text
+        stale_ids -= {other.id for other in changed}
+        for other in PlagiarismFingerprint.objects.filter(id__in=stale_ids):
+            _recompute_max_similarity(other)
+            changed.append(other)
+
+        if changed:
+            PlagiarismFingerprint.objects.bulk_update(
+                changed,
+                fields=["max_similarity", "matched_submission", "status"]
+            )
+
+    logger.info(
+        f"Indexed {submission.id} for plagiarism: "
+        f"max_similarity={fingerprint.max_similarity:.4f}, status={fingerprint.status}"
+    )
+    return fingerprint
+
+
+def _bucket_neighbours(fingerprint, band_keys):
+    """
+    Fingerprints of the same assignment sharing an LSH bucket with
+    `fingerprint`.
+    """
+    candidate_ids = (
+        PlagiarismBand.objects
+        .filter(assignment_id=fingerprint.assignment_id, key__in=band_keys)
+        .exclude(fingerprint=fingerprint)
+        .values("fingerprint_id")
+    )
+    return PlagiarismFingerprint.objects.filter(id__in=candidate_ids)
+
+
+def _recompute_max_similarity(fingerprint):
+    """
+    Set the fingerprint's max similarity, match and status from scratch
+    against its current bucket neighbours. The caller saves it.
+    """
+    fingerprint.max_similarity = 0.0
+    fingerprint.matched_submission_id = None
+
+    band_keys = fingerprint.bands.values_list("key", flat=True)
+    for other in _bucket_neighbours(fingerprint, band_keys):
+        similarity = signature_similarity(fingerprint.signature, other.signature)
+        if similarity > fingerprint.max_similarity:
+            fingerprint.max_similarity = similarity
+            fingerprint.matched_submission_id = other.submission_id
+
+    fingerprint.status = similarity_status(fingerprint.max_similarity)[0]
+
+
+def build_indexed_plagiarism_results(assignment, student_assignments):
+    """
+    Merge the per-submission index into a response shaped like the
+    plagiarism service's, indexing any submission that was missed.
+    """
+    indexed = {
+        fp.submission_id: fp
+        for fp in PlagiarismFingerprint.objects.filter(assignment=assignment)
+    }
+
+    missing = [
+        sub for sub in student_assignments
+        if sub.id not in indexed and sub.extracted_text
+    ]
+    for sub in missing:
+        index_submission(sub)
+
+    if missing:
+        indexed = {
+            fp.submission_id: fp
+            for fp in PlagiarismFingerprint.objects.filter(assignment=assignment)
+        }
+
+    results = []
+    for sub in student_assignments:
+        fingerprint = indexed.get(sub.id)
+        if fingerprint is None:
+            continue  # skip OCR failures
+
+        status, penalty = similarity_status(fingerprint.max_similarity)
+        results.append({
+            "assignment_id": str(sub.id),
+            "plagiarism_score": penalty,
+            "max_similarity": round(fingerprint.max_similarity, 4),
+            "status": status
+        })
+
+    return {"success": True, "results": results}
@@ -1,13 +1,33 @@
 from django.db import transaction
 from classroom.models import StudentAssignment
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Rows per UPDATE statement issued by bulk_update
+PLAGIARISM_BULK_BATCH_SIZE = 1000
+
+# Marks given to a fully original submission (penalty 0.0)
+MAX_PLAG_MARKS = 10.0
+
+
+def _plagiarism_marks(plag_penalty):
+    # The microservice returns "plagiarism_score" as the PENALTY.
+    # 0.0 = Original (Good), 1.0 = Copied (Bad)
+    # If Penalty is 0.0 (Original) -> Marks = 10.0
+    # If Penalty is 1.0 (Copied)   -> Marks = 0.0
+    # If Penalty is 0.5 (Suspect)  -> Marks = 5.0
+    return round(MAX_PLAG_MARKS * (1.0 - plag_penalty), 2)
+
 
 def save_plagiarism_results(plagiarism_response: dict):
     """
-    Persist plagiarism results returned by plagiarism microservice
+    Persist plagiarism results returned by plagiarism microservice.
+
+    All rows are written with set-based UPDATEs (one per
+    PLAGIARISM_BULK_BATCH_SIZE results) instead of a locked
+    read-modify-write per submission.
     """
     if not plagiarism_response.get("success"):
         raise ValueError("Plagiarism response unsuccessful")
@@ -17,58 +37,46 @@ def save_plagiarism_results(plagiarism_response: dict):
         logger.warning("No plagiarism results to persist")
         return
 
+    submissions = {}
+    for result in results:
+        submission_id = result.get("assignment_id")
+
+        if not submission_id:
+            continue
+
+        try:
+            submission_id = uuid.UUID(str(submission_id))
+        except ValueError:
+            logger.warning(f"Skipping plagiarism result with invalid id {submission_id!r}")
+            continue
+
+        plag_penalty = result.get("plagiarism_score")
+        similarity = result.get("max_similarity")
+
+        # Defensive defaults
+        plag_penalty = float(plag_penalty) if plag_penalty is not None else 0.0
+        similarity = float(similarity) if similarity is not None else 0.0
+
+        # bulk_update only touches rows whose primary key exists, so
+        # results for deleted submissions are dropped without a lookup.
+        submissions[submission_id] = StudentAssignment(
+            id=submission_id,
+            plagiarism_similarity=round(similarity, 4),
+            plagiarism_score=_plagiarism_marks(plag_penalty),  # SCORE (High is Good)
+            plagiarism_status=result.get("status"),
+            evaluation_stage="plagiarism_done",
+        )
+
     with transaction.atomic():
-        for result in results:
-            submission_id = result.get("assignment_id")
-
-            if not submission_id:
-                continue
-
-            try:
-                submission = StudentAssignment.objects.select_for_update().get(
-                    id=submission_id
-                )
-            except StudentAssignment.DoesNotExist:
-                continue
-
-            # 1. GET THE PENALTY (0.0 to 1.0)
-            # The microservice returns "plagiarism_score" as the PENALTY.
-            # 0.0 = Original (Good), 1.0 = Copied (Bad)
-            plag_penalty = result.get("plagiarism_score") 
-            similarity = result.get("max_similarity")
-            status = result.get("status")
-
-            # Defensive defaults
-            plag_penalty = float(plag_penalty) if plag_penalty is not None else 0.0
-            similarity = float(similarity) if similarity is not None else 0.0
-
-            # 2. CONVERT PENALTY TO MARKS (10.0 Scale)
-            # If Penalty is 0.0 (Original) -> Marks = 10.0
-            # If Penalty is 1.0 (Copied)   -> Marks = 0.0
-            # If Penalty is 0.5 (Suspect)  -> Marks = 5.0
-            MAX_PLAG_MARKS = 10.0
-            plag_marks = MAX_PLAG_MARKS * (1.0 - plag_penalty)
-            
-            # Round for cleanliness
-            plag_marks = round(plag_marks, 2)
-
-            # 3. SAVE TO DB
-            submission.plagiarism_similarity = round(similarity, 4)
-            submission.plagiarism_score = plag_marks  # Now this is a SCORE (High is Good)
-            submission.plagiarism_status = status
-
-            # IMPORTANT: Don't set `submission.marks` here yet if you want to keep them separate.
-            # But if your frontend relies on it temporarily, you can keep it.
-            
-            submission.save(
-                update_fields=[
-                    "plagiarism_similarity",
-                    "plagiarism_score",
-                    "plagiarism_status"
-                ]
-            )
-
-            logger.info(
-                f"Plagiarism saved for {submission.id}: "
-                f"Penalty={plag_penalty}, Marks={plag_marks}, Status={status}"
-            )
+        StudentAssignment.objects.bulk_update(
+            submissions.values(),
+            fields=[
+                "plagiarism_similarity",
+                "plagiarism_score",
+                "plagiarism_status",
+                "evaluation_stage"
+            ],
+            batch_size=PLAGIARISM_BULK_BATCH_SIZE
+        )
+
+    logger.info(f"Plagiarism saved for {len(submissions)} submissions")
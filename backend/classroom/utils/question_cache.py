@@ -0,0 +1,60 @@
+import logging
+
+from decouple import config
+from django.db.models import F
+from django.utils import timezone
+
+from classroom.models import QuestionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Beyond this many entries the least recently used ones are evicted
+QUESTION_CACHE_MAX_ENTRIES = config("QUESTION_CACHE_MAX_ENTRIES", default=1000, cast=int)
+
+
+def get_cached_questions(content_sha256, num_questions, difficulty):
+    """
+    Cached question generator response for the PDF hash and parameters, or
+    None. Marks the entry as used.
+    """
+    entry = (
+        QuestionCacheEntry.objects
+        .filter(
+            content_sha256=content_sha256,
+            num_questions=num_questions,
+            difficulty=difficulty
+        )
+        .only("id", "response")
+        .first()
+    )
+    if entry is None:
+        return None
+
+    QuestionCacheEntry.objects.filter(id=entry.id).update(
+        hits=F("hits") + 1,
+        last_used_at=timezone.now()
+    )
+    return entry.response
+
+
+def store_generated_questions(content_sha256, num_questions, difficulty, response):
+    """
+    Cache a generator response, replacing any earlier one for the same key,
+    then evict the least recently used entries beyond
+    QUESTION_CACHE_MAX_ENTRIES.
+    """
+    QuestionCacheEntry.objects.update_or_create(
+        content_sha256=content_sha256,
+        num_questions=num_questions,
+        difficulty=difficulty,
+        defaults={"response": response, "last_used_at": timezone.now()}
+    )
+
+    excess_ids = list(
+        QuestionCacheEntry.objects
+        .order_by("-last_used_at")
+        .values_list("id", flat=True)[QUESTION_CACHE_MAX_ENTRIES:]
+    )
+    if excess_ids:
+        evicted, _ = QuestionCacheEntry.objects.filter(id__in=excess_ids).delete()
+        logger.info(f"[QUESTION CACHE] Evicted {evicted} entries")
@@ -1,11 +1,29 @@
-import requests
 import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor, wait
 from requests.exceptions import RequestException
 from decouple import config
 
+from classroom.utils import http_client
+
 RAG_PATH = config("RAG_PATH")
 TRAIN_URL = f"{RAG_PATH}/train"
 SCORE_URL = f"{RAG_PATH}/score"
+SCORE_BATCH_URL = f"{RAG_PATH}/score/batch"
+
+# Marks the collections this deployment creates when several deployments
+# (e.g. production and staging) share a RAG service. Up to 20 of
+# [a-z0-9_-], e.g. "prod_"
+RAG_COLLECTION_PREFIX = config("RAG_COLLECTION_PREFIX", default="")
+
+# Max scoring requests one worker keeps in flight
+RAG_SCORE_CONCURRENCY = config("RAG_SCORE_CONCURRENCY", default=8, cast=int)
+
+# Texts sent per /score/batch request (0 scores one text per request)
+RAG_SCORE_BATCH_SIZE = config("RAG_SCORE_BATCH_SIZE", default=20, cast=int)
+
+# Extra read timeout allowed per text beyond the first in a batch
+RAG_SCORE_BATCH_ITEM_TIMEOUT = config("RAG_SCORE_BATCH_ITEM_TIMEOUT", default=30, cast=int)
 
 def generate_rag_collection_name(assignment_id):
     """
@@ -14,6 +32,13 @@ def generate_rag_collection_name(assignment_id):
     hash_digest = hashlib.sha256(str(assignment_id).encode()).hexdigest()[:16]
     return f"assign_{hash_digest}"
 
+def generate_content_collection_name(content_sha256):
+    """
+    ChromaDB-safe collection name for a resource PDF's content hash,
+    starting with this deployment's RAG_COLLECTION_PREFIX
+    """
+    return f"{RAG_COLLECTION_PREFIX}res_{content_sha256[:32]}"
+
 def train_rag_from_pdf(file_path, collection_name, timeout=120):
     """
     Sends a PDF to RAG microservice for training.
@@ -29,7 +54,8 @@ def train_rag_from_pdf(file_path, collection_name, timeout=120):
                 "collection_name": collection_name
             }
 
-            resp = requests.post(
+            resp = http_client.post(
+                "rag",
                 TRAIN_URL,
                 files=files,
                 data=data,
@@ -43,13 +69,29 @@ def train_rag_from_pdf(file_path, collection_name, timeout=120):
         raise RuntimeError(f"RAG training failed: {str(e)}")
 
 def delete_rag_collection(collection_name: str):
-    resp = requests.delete(
+    resp = http_client.delete(
+        "rag",
         f"{RAG_PATH}/collection/{collection_name}",
         timeout=30
     )
     resp.raise_for_status()
     return resp.json()
 
+def list_rag_collections():
+    """
+    Names of the collections the RAG service holds, or None if it has no
+    listing endpoint.
+    """
+    resp = http_client.get("rag", f"{RAG_PATH}/collections", timeout=30)
+    if resp.status_code in (404, 405):
+        return None
+    resp.raise_for_status()
+
+    data = resp.json()
+    if isinstance(data, dict):
+        data = data.get("collections", [])
+    return [item["name"] if isinstance(item, dict) else item for item in data]
+
 def generate_questions_from_rag(
     collection_name: str,
     num_questions: int,
@@ -65,7 +107,8 @@ def generate_questions_from_rag(
         "difficulty": difficulty
     }
     print(payload)
-    resp = requests.post(
+    resp = http_client.post(
+        "rag",
         f"{RAG_PATH}/generate-questions",
         json=payload,
         timeout=120
@@ -80,16 +123,181 @@ def score_assignment_text(
     timeout: int = 420
 ):
     try:
-        resp = requests.post(
-            SCORE_URL,
-            data={
-                "collection_name": collection_name,
-                "extracted_text": extracted_text
-            },
-            timeout=timeout
-        )
-        resp.raise_for_status()
-        return resp.json()
+        return _post_score(collection_name, extracted_text, timeout)
 
     except RequestException as e:
         raise RuntimeError(f"RAG scoring failed: {str(e)}")
+
+
+def _post_score(collection_name, extracted_text, timeout):
+    resp = http_client.post(
+        "rag",
+        SCORE_URL,
+        data={
+            "collection_name": collection_name,
+            "extracted_text": extracted_text
+        },
+        timeout=timeout,
+        retry_post=True
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+def _run_with_deadline(fn, args_by_key, concurrency, deadline):
+    """
+    Run fn(arg) for each key of `args_by_key` on up to `concurrency` threads
+    and wait at most `deadline` seconds for all of them. Returns {key: result
+    or exception}; keys still running at the deadline get a RuntimeError.
+
+    The pool is shut down without waiting, so a hung request is abandoned on
+    its thread instead of holding up the caller.
+    """
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {executor.submit(fn, arg): key for key, arg in args_by_key.items()}
+        done, _ = wait(futures, timeout=deadline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for future, key in futures.items():
+        if future not in done:
+            results[key] = RuntimeError(
+                f"RAG scoring failed: deadline of {deadline}s exceeded"
+            )
+        elif future.exception() is not None:
+            results[key] = future.exception()
+        else:
+            results[key] = future.result()
+    return results
+
+def _deadline(count, concurrency, timeout):
+    # Long enough for every request to use its full timeout, one round of
+    # `concurrency` requests after another
+    return timeout * math.ceil(count / concurrency)
+
+def score_texts_concurrently(
+    collection_name: str,
+    texts: dict,
+    concurrency: int = RAG_SCORE_CONCURRENCY,
+    timeout: int = 420
+):
+    """
+    Score many texts against one collection, keeping up to `concurrency`
+    requests in flight over a shared keep-alive pool. Each request has a
+    `timeout`, and the whole call gives up after `timeout` per round of
+    `concurrency` requests.
+
+    `texts` maps a caller-chosen key to extracted_text. Returns a dict mapping
+    the same keys to the response JSON, or to the exception for that item.
+    """
+    if not texts:
+        return {}
+
+    concurrency = max(1, min(concurrency, len(texts)))
+
+    def score_one(extracted_text):
+        try:
+            return _post_score(collection_name, extracted_text, timeout)
+        except RequestException as e:
+            raise RuntimeError(f"RAG scoring failed: {str(e)}")
+
+    return _run_with_deadline(
+        score_one,
+        texts,
+        concurrency,
+        _deadline(len(texts), concurrency, timeout)
+    )
+
+def _post_score_batch(collection_name, items, timeout):
+    """
+    Score [(key, extracted_text), ...] in one request. Returns {key: item
+    result}, where an item result is shaped like a /score response
+    ({"success", "score"} or {"success": False, "error"}); items the service
+    left out of its reply get an exception.
+
+    `timeout` is for a single text and grows by RAG_SCORE_BATCH_ITEM_TIMEOUT
+    per extra text. Only connection errors and 5xx replies are retried; a
+    batch that times out is not sent again.
+    """
+    timeout = timeout + RAG_SCORE_BATCH_ITEM_TIMEOUT * (len(items) - 1)
+
+    resp = http_client.post(
+        "rag",
+        SCORE_BATCH_URL,
+        json={
+            "collection_name": collection_name,
+            "items": [
+                {"id": key, "extracted_text": extracted_text}
+                for key, extracted_text in items
+            ]
+        },
+        timeout=timeout,
+        retry_post=True
+    )
+    resp.raise_for_status()
+
+    results = {result.get("id"): result for result in resp.json().get("results", [])}
+
+    return {
+        key: results.get(key, RuntimeError("RAG scoring failed: missing from batch reply"))
+        for key, _ in items
+    }
+
+def score_many(
+    collection_name: str,
+    texts: dict,
+    batch_size: int = RAG_SCORE_BATCH_SIZE,
+    concurrency: int = RAG_SCORE_CONCURRENCY,
+    timeout: int = 420
+):
+    """
+    Score many texts against one collection in /score/batch requests of up
+    to `batch_size` texts, keeping up to `concurrency` batches in flight.
+
+    Same contract as score_texts_concurrently: returns a dict mapping each
+    key of `texts` to the response JSON or to the exception for that item.
+    A failed batch fails all of its items. Falls back to one request per
+    text if batch_size is 0 or the service has no batch endpoint.
+    """
+    if not texts:
+        return {}
+
+    if batch_size <= 0:
+        return score_texts_concurrently(collection_name, texts, concurrency, timeout)
+
+    items = list(texts.items())
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    def score_batch(batch):
+        try:
+            return _post_score_batch(collection_name, batch, timeout)
+        except RequestException as e:
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code in (404, 405):
+                # Service predates the batch endpoint
+                return score_texts_concurrently(
+                    collection_name, dict(batch), concurrency, timeout
+                )
+            error = RuntimeError(f"RAG scoring failed: {str(e)}")
+            return {key: error for key, _ in batch}
+        except Exception as e:
+            return {key: e for key, _ in batch}
+
+    concurrency = max(1, min(concurrency, len(batches)))
+    batch_timeout = timeout + RAG_SCORE_BATCH_ITEM_TIMEOUT * (batch_size - 1)
+
+    results = _run_with_deadline(
+        score_batch,
+        dict(enumerate(batches)),
+        concurrency,
+        _deadline(len(batches), concurrency, batch_timeout)
+    )
+
+    responses = {}
+    for index, result in results.items():
+        if isinstance(result, Exception):
+            result = {key: result for key, _ in batches[index]}
+        responses.update(result)
+
+    return responses
@@ -0,0 +1,170 @@
+import logging
+from datetime import timedelta
+
+from decouple import config
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from classroom.models import Assignment, RagCollection
+from classroom.utils.rag_score_cache import invalidate_rag_scores
+from classroom.utils.rag_client import (
+    delete_rag_collection,
+    generate_content_collection_name,
+    train_rag_from_pdf,
+)
+
+logger = logging.getLogger(__name__)
+
+# A "training" claim older than this is assumed abandoned by a dead worker
+RAG_TRAINING_CLAIM_TIMEOUT = timedelta(minutes=15)
+
+# Collections trained for a question preview are kept this long for the
+# assignment created from it; creating the assignment makes them permanent
+RAG_PREVIEW_TTL_MINUTES = config("RAG_PREVIEW_TTL_MINUTES", default=120, cast=int)
+
+
+class CollectionBusy(Exception):
+    """
+    Another worker is training the same content right now.
+    """
+
+
+def ensure_rag_collection(content_sha256, file_path, preview=False):
+    """
+    Name of a ready collection for the content, training it from
+    `file_path` only if no collection exists for the same content yet.
+    `file_path` may be a callable returning the path, called only when
+    training is needed.
+
+    With preview=True a new collection expires after RAG_PREVIEW_TTL_MINUTES
+    unless an assignment claims it first; otherwise the collection is made
+    permanent. Raises CollectionBusy while another worker trains the same
+    content.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(minutes=RAG_PREVIEW_TTL_MINUTES) if preview else None
+
+    collection, created = RagCollection.objects.get_or_create(
+        content_sha256=content_sha256,
+        defaults={
+            "name": generate_content_collection_name(content_sha256),
+            "expires_at": expires_at,
+        }
+    )
+
+    if not created:
+        # The stamp keeps the janitor off a collection that is being
+        # claimed before the claiming assignment is saved
+        claim = {"last_claimed_at": now}
+        if not preview:
+            claim["expires_at"] = None
+        touched = RagCollection.objects.filter(id=collection.id).update(**claim)
+        if not touched:
+            # Reclaimed by the janitor since the lookup; start over
+            return ensure_rag_collection(content_sha256, file_path, preview)
+
+        if preview:
+            # Only extend previews; permanent collections stay permanent
+            RagCollection.objects.filter(
+                id=collection.id,
+                expires_at__isnull=False
+            ).update(expires_at=Greatest("expires_at", expires_at))
+        elif collection.expires_at is not None:
+            logger.info(f"[RAG PREVIEW PROMOTED] {collection.name}")
+
+    if collection.status == "ready":
+        logger.info(f"[RAG COLLECTION HIT] {collection.name}")
+        return collection.name
+
+    claimed = RagCollection.objects.filter(
+        Q(status__in=["pending", "failed"]) |
+        Q(status="training", training_started_at__lt=now - RAG_TRAINING_CLAIM_TIMEOUT),
+        id=collection.id
+    ).update(status="training", training_started_at=now)
+
+    if not claimed:
+        raise CollectionBusy(collection.name)
+
+    # Scores against an earlier training of the collection no longer hold
+    invalidate_rag_scores(collection.name)
+
+    try:
+        train_rag_from_pdf(
+            file_path=file_path() if callable(file_path) else file_path,
+            collection_name=collection.name
+        )
+    except Exception:
+        RagCollection.objects.filter(id=collection.id).update(status="failed")
+        raise
+
+    RagCollection.objects.filter(id=collection.id).update(
+        status="ready",
+        trained_at=timezone.now()
+    )
+    logger.info(f"[RAG COLLECTION TRAINED] {collection.name}")
+
+    return collection.name
+
+
+def ensure_preview_collection(content_sha256, pdf_bytes):
+    """
+    Preview collection for an uploaded resource PDF. The PDF is written to
+    temp/ only if it has to be trained.
+    """
+    temp_paths = []
+
+    def save_temp_pdf():
+        temp_path = default_storage.save(
+            f"temp/rag_tmp_{content_sha256[:8]}.pdf",
+            ContentFile(pdf_bytes)
+        )
+        temp_paths.append(temp_path)
+        return default_storage.path(temp_path)
+
+    try:
+        return ensure_rag_collection(content_sha256, save_temp_pdf, preview=True)
+    finally:
+        for temp_path in temp_paths:
+            default_storage.delete(temp_path)
+
+
+def release_rag_collection(collection_name):
+    """
+    Delete the collection if no assignment refers to it any more. Call it
+    after the referring assignment is deleted. A collection claimed within
+    RAG_TRAINING_CLAIM_TIMEOUT is kept, as the claiming assignment may not
+    be saved yet; the janitor reclaims it later if it stays unreferenced.
+    """
+    if not collection_name:
+        return False
+
+    # Lock the row so a concurrent claim in ensure_rag_collection waits and
+    # then finds it gone and trains afresh
+    with transaction.atomic():
+        row = (
+            RagCollection.objects
+            .select_for_update()
+            .filter(name=collection_name)
+            .first()
+        )
+
+        if Assignment.objects.filter(rag_collection=collection_name).exists():
+            logger.info(f"[RAG COLLECTION KEPT] {collection_name} still in use")
+            return False
+
+        if row is not None and row.last_claimed_at > timezone.now() - RAG_TRAINING_CLAIM_TIMEOUT:
+            logger.info(f"[RAG COLLECTION KEPT] {collection_name} claimed recently")
+            return False
+
+        delete_rag_collection(collection_name)
+        if row is not None:
+            row.delete()
+
+    invalidate_rag_scores(collection_name)
+    logger.info(f"[RAG COLLECTION DELETED] {collection_name}")
+
+    return True
@@ -0,0 +1,69 @@
+import hashlib
+import logging
+import re
+import unicodedata
+
+from django.db.models import F
+
+from classroom.models import RagScoreCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalised_text_sha256(text):
+    """
+    Hex SHA-256 of the text with Unicode forms, case and whitespace
+    normalised, so re-OCR'd or trivially reformatted copies hash the same.
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_cached_scores(collection_name, text_hashes):
+    """
+    {text hash: cached /score response} for the hashes scored before
+    against the collection. Marks the entries as used.
+    """
+    entries = dict(
+        RagScoreCacheEntry.objects
+        .filter(collection_name=collection_name, text_sha256__in=set(text_hashes))
+        .values_list("text_sha256", "response")
+    )
+    if entries:
+        RagScoreCacheEntry.objects.filter(
+            collection_name=collection_name,
+            text_sha256__in=entries.keys()
+        ).update(hits=F("hits") + 1)
+
+    return entries
+
+
+def store_scores(collection_name, responses):
+    """
+    Cache the successful responses of {text hash: response}. Errors and
+    unsuccessful responses are not cached.
+    """
+    entries = [
+        RagScoreCacheEntry(
+            collection_name=collection_name,
+            text_sha256=text_sha256,
+            response=response
+        )
+        for text_sha256, response in responses.items()
+        if isinstance(response, dict) and response.get("success")
+    ]
+    # A concurrent worker may have scored the same text already
+    RagScoreCacheEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def invalidate_rag_scores(collection_name):
+    """
+    Forget every score against the collection, e.g. before it is retrained.
+    """
+    deleted, _ = RagScoreCacheEntry.objects.filter(collection_name=collection_name).delete()
+    if deleted:
+        logger.info(f"[RAG SCORE CACHE] Invalidated {deleted} scores of {collection_name}")
+    return deleted
@@ -0,0 +1,52 @@
+from django.db import transaction
+
+from classroom.models import StudentAssignment, SubmissionPage, compress_text
+
+
+def _forget_extracted_text(submission):
+    # Later reads of submission.extracted_text see the new pages
+    getattr(submission, "_prefetched_objects_cache", {}).pop("pages", None)
+
+
+def save_submission_pages(submission, pages, fields=()):
+    """
+    Replace the submission's pages with `pages` (the OCR client's
+    [{"page_number", "extracted_text", "source"}, ...]), which become its
+    extracted text. `fields` are fields of the submission to save
+    alongside.
+    """
+    rows = [
+        SubmissionPage(
+            submission=submission,
+            page_number=page.get("page_number") or number,
+            data=compress_text(page.get("extracted_text") or ""),
+            source=page.get("source") or "ocr"
+        )
+        for number, page in enumerate(pages, start=1)
+    ]
+
+    with transaction.atomic():
+        SubmissionPage.objects.filter(submission=submission).delete()
+        SubmissionPage.objects.bulk_create(rows)
+        if fields:
+            submission.save(update_fields=list(fields))
+
+    _forget_extracted_text(submission)
+
+    return rows
+
+
+def update_submission_page(submission_id, page_number, text, source="ocr"):
+    """
+    Replace one page's text, and with it the submission's extracted_text.
+    """
+    with transaction.atomic():
+        submission = StudentAssignment.objects.select_for_update().get(id=submission_id)
+
+        SubmissionPage.objects.update_or_create(
+            submission=submission,
+            page_number=page_number,
+            defaults={"data": compress_text(text), "source": source}
+        )
+
+    return submission
@@ -0,0 +1,26 @@
+from django.db.models import Exists, OuterRef, Prefetch
+
+from classroom.models import SubmissionPage
+
+
+def with_extracted_text(queryset, *fields):
+    """
+    Queryset that loads each row's pages in one extra query per batch, so
+    reading extracted_text costs nothing more. With `fields`, only those
+    StudentAssignment fields (plus the pages) are fetched. Use
+    .iterator(chunk_size=...) to stream it.
+    """
+    queryset = queryset.prefetch_related(Prefetch(
+        "pages",
+        queryset=SubmissionPage.objects.only("submission_id", "page_number", "data")
+    ))
+    if fields:
+        queryset = queryset.only(*fields)
+    return queryset
+
+
+def has_extracted_text():
+    """
+    Filter for StudentAssignment rows that have been OCR'd.
+    """
+    return Exists(SubmissionPage.objects.filter(submission=OuterRef("pk")))
@@ -7,15 +7,16 @@ from django.db import transaction
 from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from student.models import Student
-from .utils.rag_client import train_rag_from_pdf, generate_rag_collection_name, delete_rag_collection, generate_questions_from_rag
+from .utils.rag_client import generate_questions_from_rag
+from .utils.rag_collections import release_rag_collection, ensure_preview_collection, CollectionBusy
 from .utils.generate_questions_pdf import generate_questions_pdf
 import os
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+import hashlib
 from django.core.files import File  
-import uuid
-from classroom.utils.celery_scheduler import schedule_assignment_evaluation
-from classroom.tasks import run_ocr_for_submission
+from classroom.tasks import run_ocr_for_submission, reocr_submission_page, train_rag_for_assignment
+from classroom.utils.ocr_cache import fingerprint_submission
+from classroom.utils.question_cache import get_cached_questions, store_generated_questions
+from classroom.task_helpers import finalize_marks
 
 class IsStudent(permissions.BasePermission):
     def has_permission(self, request, view):
@@ -159,34 +160,27 @@ class AssignmentListCreateView(generics.ListCreateAPIView):
         with transaction.atomic():
             assignment = serializer.save(
                 teacher=teacher,
-                status = 'ACTIVE',
+                status="TRAINING",
                 rag_trained=False
             )
 
-            collection_name = generate_rag_collection_name(assignment.id)
+            # Train once the row is committed; poll assignments/<id>/status/
+            transaction.on_commit(
+                lambda: train_rag_for_assignment.delay(str(assignment.id))
+            )
 
-            try:
-                train_rag_from_pdf(
-                    file_path=assignment.resource_pdf.path,
-                    collection_name=collection_name
-                )
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
 
-                assignment.rag_collection = collection_name
-                assignment.rag_trained = True
-                assignment.rag_trained_at = timezone.now()
-                assignment.save(update_fields=[
-                    "rag_collection",
-                    "rag_trained",
-                    "rag_trained_at"
-                ])
-                schedule_assignment_evaluation(assignment)
+class AssignmentStatusView(generics.RetrieveAPIView):
+    serializer_class = AssignmentTrainingStatusSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
 
-            except Exception as e:
-                # 🔥 rollback happens automatically
-                raise ValidationError({
-                    "rag": "RAG training failed. Assignment was not created.",
-                    "details": str(e)
-                })
+    def get_queryset(self):
+        teacher = self.request.user.teacher_profile
+        return Assignment.objects.filter(teacher=teacher)
 
 class AssignmentDeleteView(generics.DestroyAPIView):
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
@@ -199,32 +193,144 @@ class AssignmentDeleteView(generics.DestroyAPIView):
         return assignment
 
     def perform_destroy(self, assignment):
+        collection_name = assignment.rag_collection
+
         with transaction.atomic():
 
-            # 1️⃣ Delete RAG collection
-            if assignment.rag_collection:
-                try:
-                    delete_rag_collection(assignment.rag_collection)
-                except Exception as e:
-                    raise ValidationError({
-                        "rag": "Failed to delete RAG collection",
-                        "details": str(e)
-                    })
-
-            # 2️⃣ Delete PDFs from filesystem
-            for file_field in ["resource_pdf", "question_pdf"]:
-                file_obj = getattr(assignment, file_field)
-                if file_obj and os.path.exists(file_obj.path):
-                    os.remove(file_obj.path)
-
-            # 3️⃣ Delete related student submissions
+            # 1️⃣ Delete related student submissions
             StudentAssignment.objects.filter(
                 assignment=assignment
             ).delete()
 
-            # 4️⃣ Delete assignment DB row
+            # 2️⃣ Delete assignment DB row
             assignment.delete()
+
+            # 3️⃣ Delete RAG collection unless another assignment shares it
+            try:
+                release_rag_collection(collection_name)
+            except Exception as e:
+                raise ValidationError({
+                    "rag": "Failed to delete RAG collection",
+                    "details": str(e)
+                })
+
+        # 4️⃣ Delete PDFs from filesystem once the rows are gone
+        for file_field in ["resource_pdf", "question_pdf"]:
+            file_obj = getattr(assignment, file_field)
+            if file_obj and os.path.exists(file_obj.path):
+                os.remove(file_obj.path)
     
+class AssignmentFinalizeView(generics.GenericAPIView):
+    serializer_class = AssignmentWeightsSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get_queryset(self):
+        teacher = self.request.user.teacher_profile
+        return Assignment.objects.filter(teacher=teacher)
+
+    def post(self, request, pk):
+        assignment = self.get_object()
+
+        # Optionally change the grading weights before re-finalising
+        serializer = self.get_serializer(assignment, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            assignment = serializer.save()
+            updated = finalize_marks(assignment, recompute=True)
+
+        return Response({
+            "assignment_id": assignment.id,
+            "plagiarism_weight": assignment.plagiarism_weight,
+            "correctness_weight": assignment.correctness_weight,
+            "finalized_submissions": updated
+        }, status=status.HTTP_200_OK)
+    
+class AssignmentRetryTrainingView(generics.GenericAPIView):
+    """
+    Queue RAG training again for an assignment whose training FAILED.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def get_queryset(self):
+        teacher = self.request.user.teacher_profile
+        return Assignment.objects.filter(teacher=teacher)
+
+    def post(self, request, pk):
+        assignment = self.get_object()
+
+        with transaction.atomic():
+            # Conditional so two clicks queue only one training run
+            updated = Assignment.objects.filter(
+                id=assignment.id, status="FAILED"
+            ).update(status="TRAINING", rag_training_error=None)
+
+            if not updated:
+                return Response(
+                    {"error": f"Assignment is {assignment.status}; only FAILED training can be retried"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            transaction.on_commit(
+                lambda: train_rag_for_assignment.delay(str(assignment.id))
+            )
+
+        return Response({
+            "assignment_id": assignment.id,
+            "status": "TRAINING"
+        }, status=status.HTTP_202_ACCEPTED)
+
+class SubmissionPagesView(generics.ListAPIView):
+    """
+    Pages of one submission for teacher review, optionally limited to
+    ?start=&end= (1-based, inclusive).
+    """
+    serializer_class = SubmissionPageSerializer
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+    pagination_class = None
+
+    def get_queryset(self):
+        submission = get_object_or_404(
+            StudentAssignment,
+            id=self.kwargs["pk"],
+            assignment__teacher=self.request.user.teacher_profile
+        )
+        pages = SubmissionPage.objects.filter(submission=submission)
+
+        try:
+            start = int(self.request.query_params.get("start", 1))
+            end = self.request.query_params.get("end")
+            end = int(end) if end else None
+        except ValueError:
+            raise ValidationError({"detail": "start and end must be page numbers."})
+
+        pages = pages.filter(page_number__gte=start)
+        if end is not None:
+            pages = pages.filter(page_number__lte=end)
+
+        return pages.order_by("page_number")
+
+class SubmissionPageReocrView(generics.GenericAPIView):
+    permission_classes = [permissions.IsAuthenticated, IsTeacher]
+
+    def post(self, request, pk, page_number):
+        submission = get_object_or_404(
+            StudentAssignment,
+            id=pk,
+            assignment__teacher=request.user.teacher_profile
+        )
+
+        if not SubmissionPage.objects.filter(submission=submission, page_number=page_number).exists():
+            return Response({"error": "Page not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        reocr_submission_page.delay(str(submission.id), page_number)
+
+        return Response({
+            "submission_id": submission.id,
+            "page_number": page_number,
+            "status": "queued"
+        }, status=status.HTTP_202_ACCEPTED)
+
 class StudentAssignmentListView(generics.ListAPIView):
     serializer_class = AssignmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsTeacher]
@@ -286,6 +392,9 @@ class StudentAssignmentSubmitView(generics.CreateAPIView):
             ocr_status="pending"
         )
 
+        # Hash now so byte-identical uploads are flagged straight away
+        fingerprint_submission(submission)
+
         run_ocr_for_submission.delay(str(submission.id))
 
 class ClassroomSubmissionStatusView(generics.GenericAPIView):
@@ -311,7 +420,7 @@ class ClassroomSubmissionStatusView(generics.GenericAPIView):
         submissions = StudentAssignment.objects.filter(
             assignment__in=assignments,
             student__in=[sc.student for sc in enrolled_students]
-        ).select_related('assignment', 'student')
+        ).select_related('assignment', 'student', 'plagiarism_fingerprint')
 
         submission_map = {(s.student.id, s.assignment.id): s for s in submissions}
         assignment_stats = (
@@ -335,6 +444,10 @@ class ClassroomSubmissionStatusView(generics.GenericAPIView):
             student = enrolled.student
             for assignment in assignments:
                 submission = submission_map.get((student.id, assignment.id))
+                fingerprint = (
+                    getattr(submission, "plagiarism_fingerprint", None)
+                    if submission else None
+                )
 
                 assignment_stat = stats_map.get(assignment.id, {})
 
@@ -362,6 +475,11 @@ class ClassroomSubmissionStatusView(generics.GenericAPIView):
                     "final_score": submission.final_score if submission else None,
                     "plagiarism_score": submission.plagiarism_score if submission else None,
 
+                    # provisional flags from the incremental plagiarism index
+                    "provisional_similarity": fingerprint.max_similarity if fingerprint else None,
+                    "provisional_plagiarism_status": fingerprint.status if fingerprint else None,
+                    "exact_copy_of": submission.exact_copy_of_id if submission else None,
+
                     # 👇 new summary fields
                     "total_students": total_students,
                     "submitted_students": assignment_stat.get("submitted_count", 0),
@@ -385,29 +503,36 @@ class GenerateAssignmentQuestionsView(generics.GenericAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        # 2. Save PDF temporarily
-        temp_name = f"rag_tmp_{uuid.uuid4().hex[:8]}.pdf"
-        temp_path = default_storage.save(
-            f"temp/{temp_name}",
-            ContentFile(resource_pdf.read())
-        )
-        full_path = default_storage.path(temp_path)
+        num_questions = serializer.validated_data["num_questions"]
+        difficulty = serializer.validated_data["difficulty"]
+        pdf_bytes = resource_pdf.read()
+        content_sha256 = hashlib.sha256(pdf_bytes).hexdigest()
 
-        # 3. Create valid collection name
-        collection_name = f"{uuid.uuid4().hex[:12]}"
+        # 2. Same PDF and parameters as an earlier request: reuse its questions
+        rag_response = None
+        if not serializer.validated_data["refresh"]:
+            rag_response = get_cached_questions(content_sha256, num_questions, difficulty)
+        cached = rag_response is not None
 
         try:
-            # 4. Train RAG
-            train_rag_from_pdf(
-                file_path=full_path,
-                collection_name=collection_name
-            )
+            if not cached:
+                # 3. Train RAG, unless this PDF was previewed or assigned
+                # before. The collection is kept for the assignment created
+                # from it.
+                collection_name = ensure_preview_collection(content_sha256, pdf_bytes)
+
+                # 4. Generate questions
+                rag_response = generate_questions_from_rag(
+                    collection_name=collection_name,
+                    num_questions=num_questions,
+                    difficulty=difficulty
+                )
+                store_generated_questions(content_sha256, num_questions, difficulty, rag_response)
 
-            # 5. Generate questions
-            rag_response = generate_questions_from_rag(
-                collection_name=collection_name,
-                num_questions=serializer.validated_data["num_questions"],
-                difficulty=serializer.validated_data["difficulty"]
+        except CollectionBusy:
+            return Response(
+                {"error": "This PDF is still being processed, try again shortly"},
+                status=status.HTTP_409_CONFLICT
             )
 
         except Exception as e:
@@ -416,11 +541,7 @@ class GenerateAssignmentQuestionsView(generics.GenericAPIView):
                 "details": str(e)
             })
 
-        finally:
-            # 6. Cleanup PDF
-            default_storage.delete(temp_path)
-
-        # 7. Transform response for frontend
+        # 5. Transform response for frontend
         questions = [
             {
                 "question_number": q["question_number"],
@@ -432,7 +553,8 @@ class GenerateAssignmentQuestionsView(generics.GenericAPIView):
         return Response({
             "difficulty": rag_response.get("difficulty"),
             "total_questions": rag_response.get("total_questions"),
-            "questions": questions
+            "questions": questions,
+            "cached": cached
         }, status=status.HTTP_200_OK)
     
 class GeneratedAssignmentCreateView(generics.GenericAPIView):
@@ -482,36 +604,19 @@ class GeneratedAssignmentCreateView(generics.GenericAPIView):
 
 
             assignment.questions_ready = True
+            assignment.status = "TRAINING"
+            assignment.save(update_fields=["questions_ready", "status"])
 
-            # 3️⃣ Train RAG permanently
-            collection_name = generate_rag_collection_name(assignment.id)
-
-            try:
-                train_rag_from_pdf(
-                    file_path=assignment.resource_pdf.path,
-                    collection_name=collection_name
-                )
-            except Exception as e:
-                raise ValidationError({
-                    "rag": "RAG training failed",
-                    "details": str(e)
-                })
-
-            # 4️⃣ Finalize assignment
-            assignment.rag_collection = collection_name
-            assignment.rag_trained = True
-            assignment.rag_trained_at = timezone.now()
-            assignment.status = "ACTIVE"
-
-            assignment.save()
-            schedule_assignment_evaluation(assignment)
-
+            # 3️⃣ Train RAG in the background; it activates the assignment
+            transaction.on_commit(
+                lambda: train_rag_for_assignment.delay(str(assignment.id))
+            )
 
         return Response(
             {
-                "message": "Assignment created successfully",
-                "assignment_id": assignment.id
+                "message": "Assignment created, RAG training in progress",
+                "assignment_id": assignment.id,
+                "status": assignment.status
             },
-            status=status.HTTP_201_CREATED
+            status=status.HTTP_202_ACCEPTED
         )
-    
\ No newline at end of file
@@ -12,6 +12,27 @@ app.autodiscover_tasks()
 app.conf.task_acks_late = True
 app.conf.worker_prefetch_multiplier = 1
 
+# One queue per workload class so a long deadline evaluation can't hold up
+# OCR of fresh uploads. Workers only consume the queues given with -Q (just
+# 'default' without it), so every queue below needs a worker: see
+# celery_workers.sh, or the single worker in docker-compose.yaml.
+app.conf.task_default_queue = 'default'
+app.conf.task_routes = {
+    'classroom.tasks.run_ocr_for_submission': {'queue': 'ocr'},
+    'classroom.tasks.reocr_submission_page': {'queue': 'ocr'},
+    'classroom.tasks.index_submission_for_plagiarism': {'queue': 'evaluation'},
+    'classroom.tasks.evaluate_assignment_after_deadline': {'queue': 'evaluation'},
+    'classroom.tasks.score_submissions_with_rag': {'queue': 'evaluation'},
+    'classroom.tasks.finalize_assignment_evaluation': {'queue': 'evaluation'},
+    'classroom.tasks.evaluation_chord_failed': {'queue': 'evaluation'},
+    # Polls the RAG chord with the database result backend
+    'celery.chord_unlock': {'queue': 'evaluation'},
+    'classroom.tasks.train_rag_for_assignment': {'queue': 'rag-training'},
+    'classroom.tasks.evict_stale_ocr_cache': {'queue': 'maintenance'},
+    'classroom.tasks.evict_orphaned_resources': {'queue': 'maintenance'},
+    'config.celery.debug_task': {'queue': 'maintenance'},
+}
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
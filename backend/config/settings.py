@@ -1,6 +1,7 @@
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
+from celery.schedules import crontab
 import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -202,10 +203,30 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@assignmatch.com')
 
 # Celery Settings
-CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"
+CELERY_BROKER_URL = config('CELERY_BROKER_URL', default="redis://127.0.0.1:6379/0")
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'django-db'
 CELERY_TIMEZONE = 'Asia/Kolkata'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Message priorities on Redis: each queue is split into one list per step
+# and a worker reads lower steps first, so 0 is served first. Tasks default
+# to the middle so urgent work (e.g. OCR holding up a deadline evaluation)
+# can jump the queue. A worker consuming several queues takes them in turn
+# (the default round_robin queue_order_strategy), so no queue starves.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BEAT_SCHEDULE = {
+    'evict-stale-ocr-cache': {
+        'task': 'classroom.tasks.evict_stale_ocr_cache',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'evict-orphaned-resources': {
+        'task': 'classroom.tasks.evict_orphaned_resources',
+        'schedule': crontab(minute=15),
+    },
+}
  
\ No newline at end of file